@@ -0,0 +1,6 @@
+"""
+Benchmarks for the ReWear API.
+
+Run with `python manage.py benchmark`; see core/management/commands/benchmark.py.
+Everything here runs against a throwaway test database filled by datagen.
+"""
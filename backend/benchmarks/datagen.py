@@ -0,0 +1,178 @@
+"""
+Synthetic users, items and swaps for benchmarks.
+
+`generate` bulk-inserts a random catalog of the requested size and a handful of
+named fixtures that the load driver points its requests at.
+"""
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+
+from core import events, facets, geo, projections, stats
+from core.models import DomainEvent, User, Item, Swap
+
+PASSWORD = 'benchmark-password'
+
+SCALES = {
+    'small': {'users': 50, 'items': 500, 'swaps': 1000},
+    'medium': {'users': 500, 'items': 10000, 'swaps': 20000},
+    'large': {'users': 5000, 'items': 100000, 'swaps': 200000},
+    'xlarge': {'users': 20000, 'items': 1000000, 'swaps': 200000},
+}
+
+# (lat, lng) of the cities synthetic users and items cluster around
+CITIES = [
+    (23.02, 72.57), (19.08, 72.88), (28.61, 77.21), (12.97, 77.59), (22.57, 88.36),
+    (13.08, 80.27), (17.39, 78.49), (18.52, 73.86), (26.91, 75.79), (21.17, 72.83),
+]
+CITY_SPREAD = 0.15 # degrees, standard deviation around a city centre
+LOCATED_SHARE = 0.9
+
+BATCH_SIZE = 2000
+
+
+def generate(users, items, swaps, seed=1):
+    """
+    Fills the database with `users` users, `items` items and up to `swaps`
+    swaps (fewer if the random pairs run out), then returns the fixtures dict
+    used by the load driver.
+    """
+    rng = random.Random(seed)
+    # Hash once; hashing per user would dominate generation time
+    password = make_password(PASSWORD)
+
+    def random_location():
+        if rng.random() >= LOCATED_SHARE:
+            return None, None
+        lat, lng = rng.choice(CITIES)
+        return geo.coarse(rng.gauss(lat, CITY_SPREAD)), geo.coarse(rng.gauss(lng, CITY_SPREAD))
+
+    def random_user(i):
+        lat, lng = random_location()
+        return User(email=f'bench{i}@example.com', username=f'bench{i}', password=password,
+                    points=rng.randint(0, 500), latitude=lat, longitude=lng)
+
+    User.objects.bulk_create([random_user(i) for i in range(users)], batch_size=BATCH_SIZE)
+    user_ids = list(User.objects.filter(email__startswith='bench').values_list('id', flat=True))
+
+    def random_item(title):
+        redeemable = rng.random() < 0.7
+        lat, lng = random_location()
+        return Item(
+            title=title,
+            description=f'Synthetic item {title} ' * 4,
+            uploader_id=rng.choice(user_ids),
+            point_value=rng.randint(5, 200) if redeemable else None,
+            featured=rng.random() < 0.05,
+            available=rng.random() < 0.85,
+            moderation_status=rng.choices(['approved', 'pending', 'rejected'], [0.8, 0.15, 0.05])[0],
+            latitude=lat,
+            longitude=lng,
+            geohash=geo.encode(lat, lng), # bulk_create doesn't call save()
+        )
+
+    for start in range(0, items, BATCH_SIZE):
+        Item.objects.bulk_create([random_item(f'item-{i}') for i in range(start, min(items, start + BATCH_SIZE))])
+    item_rows = list(Item.objects.values_list('id', 'uploader_id'))
+    items_by_uploader = {}
+    for item_id, uploader_id in item_rows:
+        items_by_uploader.setdefault(uploader_id, []).append(item_id)
+
+    seen = set()
+    batch = []
+    for _ in range(swaps * 2):
+        if len(seen) >= swaps:
+            break
+        user_id = rng.choice(user_ids)
+        item_id, uploader_id = rng.choice(item_rows)
+        if uploader_id == user_id:
+            continue
+        offered = None
+        if rng.random() < 0.5 and items_by_uploader.get(user_id):
+            offered = rng.choice(items_by_uploader[user_id])
+        key = (user_id, item_id, offered)
+        if key in seen:
+            continue
+        seen.add(key)
+        status = rng.choices(['pending', 'approved', 'rejected'], [0.4, 0.3, 0.3])[0]
+        batch.append(Swap(user_id=user_id, item_id=item_id, requested_item_id=offered, status=status))
+        if len(batch) >= BATCH_SIZE:
+            Swap.objects.bulk_create(batch)
+            batch = []
+    Swap.objects.bulk_create(batch)
+
+    fixtures = create_fixtures(password)
+    record_events()
+    # bulk_create skips the signals and services that maintain facet counts and community stats
+    facets.rebuild()
+    stats.rebuild()
+    # A fresh test database has no planner statistics, unlike a live one; without them
+    # SQLite prefers any equality index over the geohash ranges of a nearby search
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return fixtures
+
+
+def record_events():
+    """Logs the request (and outcome) of every swap so far, then runs the projectors over them."""
+    rows = Swap.objects.order_by('id').values_list(
+        'id', 'user_id', 'item_id', 'item__title', 'item__uploader_id',
+        'requested_item_id', 'requested_item__title', 'item__point_value', 'status',
+    )
+    batch = []
+    for swap_id, user_id, item_id, item_title, owner_id, offered_id, offered_title, point_value, status in rows.iterator(chunk_size=BATCH_SIZE):
+        data = {
+            'requester_id': user_id, 'owner_id': owner_id, 'item_title': item_title,
+            'requested_item_id': offered_id, 'requested_item_title': offered_title, 'point_value': point_value,
+        }
+        batch.append(events.swap_event_from_values(events.SWAP_REQUESTED, user_id, swap_id, item_id, **data))
+        if status == 'approved':
+            batch.append(events.swap_event_from_values(events.SWAP_APPROVED, owner_id, swap_id, item_id, **data))
+        elif status == 'rejected':
+            batch.append(events.swap_event_from_values(events.SWAP_REJECTED, owner_id, swap_id, item_id, reason='declined', **data))
+        if len(batch) >= BATCH_SIZE:
+            DomainEvent.objects.bulk_create(batch)
+            batch = []
+    DomainEvent.objects.bulk_create(batch)
+    projections.catch_up()
+
+
+def create_fixtures(password):
+    """Creates the named users, items and swaps the load driver targets."""
+    owner = User.objects.create(email='owner@example.com', username='owner', password=password, points=100,
+                                latitude=CITIES[0][0], longitude=CITIES[0][1])
+    requester = User.objects.create(email='requester@example.com', username='requester', password=password, points=100000)
+    staff = User.objects.create(email='staff@example.com', username='staff', password=password, is_staff=True)
+
+    def item(title, uploader, **kwargs):
+        defaults = {'description': f'{title} description', 'point_value': 20, 'moderation_status': 'approved'}
+        defaults.update(kwargs)
+        return Item.objects.create(title=title, uploader=uploader, **defaults)
+
+    owned_item = item('Owner item', owner)
+    requestable_item = item('Requestable item', owner)
+    offered_item = item('Offered item', requester, available=False)
+    pending_item = item('Pending item', owner, moderation_status='pending')
+
+    # A realistic inbox for the owner: a few dozen pending requests on one item
+    competitors = list(User.objects.filter(email__startswith='bench').order_by('id')[:30])
+    Swap.objects.bulk_create([Swap(user=user, item=owned_item) for user in competitors])
+    pending_swap = Swap.objects.create(user=requester, item=owned_item, requested_item=offered_item)
+
+    return {
+        'password': PASSWORD,
+        'owner': owner,
+        'requester': requester,
+        'staff': staff,
+        'owned_item': owned_item,
+        'requestable_item': requestable_item,
+        'pending_item': pending_item,
+        'pending_swap': pending_swap,
+        'nearby_center': CITIES[0],
+        # Full batches for the multi-get endpoints
+        'batch_item_ids': list(
+            Item.objects.filter(available=True, moderation_status='approved').values_list('id', flat=True)[:100]
+        ),
+        'batch_swap_ids': list(Swap.objects.filter(item__uploader=owner).values_list('id', flat=True)[:100]),
+    }
@@ -0,0 +1,80 @@
+"""
+Proximity search at catalog scale (meant for `--scale xlarge`, 1M items).
+
+For each radius, searches around random points near the synthetic cities
+with core.geo.nearby, recording latency, queries, how many covering ranges
+and candidate rows the search touched, and whether the database plan for the
+candidate query uses the geohash index. The same search with only the
+bounding box on the unindexed coordinates is timed alongside as the full-scan
+baseline.
+"""
+import random
+
+from django.db.models import Q
+
+from core import geo
+from core.models import Item
+
+from .datagen import CITIES, CITY_SPREAD
+from .stats import summarize, timed
+
+RADII_KM = (1, 5, 25, 100)
+GEO_INDEX = 'core_item_geohash'
+
+
+def _public_items():
+    return Item.objects.filter(available=True, moderation_status='approved')
+
+
+def _bounding_box_only(queryset, lat, lng, radius_km):
+    # What a search without the geohash column has to do
+    south, north, west, east = geo.bounding_box(lat, lng, radius_km)
+    queryset = queryset.filter(latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        queryset = queryset.filter(longitude__gte=west, longitude__lte=east)
+    else:
+        queryset = queryset.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+    rows = queryset.values_list('pk', 'latitude', 'longitude').order_by()
+    return sorted(
+        (distance, pk) for pk, item_lat, item_lng in rows
+        if (distance := geo.haversine_km(lat, lng, item_lat, item_lng)) <= radius_km
+    )
+
+
+def run(fixtures, iterations=50, baseline_iterations=5, seed=1):
+    rng = random.Random(seed)
+    results = {}
+    for radius in RADII_KM:
+        centers = []
+        for _ in range(iterations):
+            lat, lng = rng.choice(CITIES)
+            centers.append((rng.gauss(lat, CITY_SPREAD), rng.gauss(lng, CITY_SPREAD)))
+
+        durations, query_counts, found = [], [], []
+        for lat, lng in centers:
+            result, elapsed, queries = timed(lambda: geo.nearby(_public_items(), lat, lng, radius))
+            durations.append(elapsed)
+            query_counts.append(queries)
+            found.append(len(result))
+
+        lat, lng = centers[0]
+        box = geo.bounding_box(lat, lng, radius)
+        candidates = geo.candidates(_public_items(), lat, lng, radius).values_list('pk', 'latitude', 'longitude').order_by()
+        plan = candidates.explain()
+
+        baseline = []
+        for lat, lng in centers[:baseline_iterations]:
+            _, elapsed, _ = timed(lambda: _bounding_box_only(_public_items(), lat, lng, radius))
+            baseline.append(elapsed)
+
+        # Flat, so report.compare picks up the latency and query metrics
+        results[f'{radius}km'] = summarize(
+            durations, query_counts,
+            median_found=sorted(found)[len(found) // 2],
+            covering_ranges=len(geo.covering_ranges(box)),
+            candidates_full_radius=candidates.count(),
+            uses_geo_index=GEO_INDEX in plan,
+            plan=plan,
+            bounding_box_scan=summarize(baseline),
+        )
+    return results
@@ -0,0 +1,140 @@
+"""
+In-process HTTP load driver for every route in core/urls.py.
+
+Requests go through the full Django stack (middleware, sessions, DRF) via the
+test client. Each request runs inside a transaction that is rolled back
+afterwards, so write endpoints such as approve_swap or delete_item_moderator
+can be hit repeatedly against the same fixtures.
+"""
+import contextlib
+import io
+import json
+import os
+
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import urls as core_urls
+
+from .stats import summarize, timed
+
+
+class Route:
+    def __init__(self, name, method, user=None, kwargs=None, data=None, fmt='json', relogin=False, label=None):
+        self.name = name
+        self.method = method
+        self.user = user # fixtures key of the user to log in as, or None for anonymous
+        self.kwargs = kwargs or (lambda fixtures: {}) # URL kwargs
+        self.data = data or (lambda fixtures, i: None) # request body for iteration i
+        self.fmt = fmt
+        self.relogin = relogin # the request ends the session, so log in again before each one
+        self.label = label # tells apart several profiles for the same route and method
+
+    @property
+    def key(self):
+        key = f'{self.method} {self.name}'
+        if self.user:
+            key += f' as {self.user}'
+        if self.label:
+            key += f' ({self.label})'
+        return key
+
+
+def _import_file(fixtures, i):
+    lines = ''.join(
+        json.dumps({'title': f'Imported {n}', 'description': 'Bulk imported', 'point_value': 10}) + '\n'
+        for n in range(50)
+    )
+    upload = io.BytesIO(lines.encode())
+    upload.name = 'items.ndjson'
+    return {'file': upload}
+
+
+ROUTES = [
+    Route('csrf', 'get'),
+    Route('signup', 'post', data=lambda f, i: {'email': f'load{i}@example.com', 'username': f'load{i}', 'password': 'load-password'}),
+    Route('login', 'post', data=lambda f, i: {'email': f['owner'].email, 'password': f['password']}),
+    Route('logout', 'post', user='owner', relogin=True),
+    Route('user_profile', 'get', user='owner'),
+    Route('user_profile', 'patch', user='owner', data=lambda f, i: {'latitude': 23.03, 'longitude': 72.58}),
+    Route('items', 'get'),
+    Route('items', 'get', user='staff'),
+    Route('items', 'get', data=lambda f, i: {'points': '0-49,50-99', 'redeemable': 'true', 'recency': '30d'}, label='faceted'),
+    Route('items', 'get', data=lambda f, i: {'fields': 'id,title,image,point_value'}, label='sparse'),
+    Route('items', 'post', user='owner', data=lambda f, i: {'title': f'New item {i}', 'description': 'Load test', 'point_value': 15}),
+    Route('item_detail', 'get', kwargs=lambda f: {'pk': f['owned_item'].pk}),
+    Route('item_detail', 'patch', user='owner', kwargs=lambda f: {'pk': f['owned_item'].pk}, data=lambda f, i: {'title': f'Renamed {i}'}),
+    Route('item_detail', 'delete', user='owner', kwargs=lambda f: {'pk': f['requestable_item'].pk}),
+    Route('items_nearby', 'get', data=lambda f, i: {'lat': f['nearby_center'][0], 'lng': f['nearby_center'][1], 'radius': 10}),
+    Route('items_nearby', 'get', data=lambda f, i: {'lat': f['nearby_center'][0], 'lng': f['nearby_center'][1], 'radius': 100, 'redeemable': 'true'}, label='wide'),
+    Route('item_history', 'get', user='owner', kwargs=lambda f: {'pk': f['owned_item'].pk}),
+    Route('featured_items', 'get'),
+    Route('item_facets', 'get'),
+    Route('items_batch', 'get', data=lambda f, i: {'ids': ','.join(str(pk) for pk in f['batch_item_ids'])}),
+    Route('user_swaps', 'get', user='requester'),
+    Route('swap_history', 'get', user='owner'),
+    Route('activity_feed', 'get', user='owner'),
+    Route('community_stats', 'get'),
+    Route('swaps_batch', 'get', user='owner', data=lambda f, i: {'ids': ','.join(str(pk) for pk in f['batch_swap_ids'])}),
+    Route('my_item_swaps', 'get', user='owner'),
+    Route('my_item_swaps', 'get', user='owner', data=lambda f, i: {'fields': 'id,status,user,item.title', 'expand': 'item'}, label='sparse'),
+    Route('create_swap', 'post', user='requester', data=lambda f, i: {'item_id': f['requestable_item'].pk}),
+    Route('approve_swap', 'patch', user='owner', kwargs=lambda f: {'pk': f['pending_swap'].pk}),
+    Route('disapprove_swap', 'patch', user='owner', kwargs=lambda f: {'pk': f['pending_swap'].pk}),
+    Route('moderator_items_list', 'get', user='staff'),
+    Route('approve_item', 'patch', user='staff', kwargs=lambda f: {'pk': f['pending_item'].pk}),
+    Route('reject_item', 'patch', user='staff', kwargs=lambda f: {'pk': f['pending_item'].pk}),
+    Route('delete_item_moderator', 'delete', user='staff', kwargs=lambda f: {'pk': f['pending_item'].pk}),
+    Route('import_items', 'post', user='staff', data=_import_file, fmt='multipart'),
+    Route('export_items', 'get', user='staff'),
+]
+
+
+def uncovered_routes(routes):
+    """Route names in core/urls.py that have no load profile."""
+    covered = {route.name for route in routes}
+    return sorted(pattern.name for pattern in core_urls.urlpatterns if pattern.name not in covered)
+
+
+def _request(client, route, url, fixtures, i):
+    response = getattr(client, route.method)(url, route.data(fixtures, i), format=route.fmt)
+    if response.streaming:
+        # Streaming responses do their work while being consumed
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    return response.status_code, len(content)
+
+
+def run(fixtures, iterations=100, warmup=3, routes=ROUTES):
+    results = {}
+    # The views print a lot; keep the report readable
+    devnull = open(os.devnull, 'w')
+    for route in routes:
+        client = APIClient()
+        user = fixtures[route.user] if route.user else None
+        url = reverse(route.name, kwargs=route.kwargs(fixtures))
+        if user and not route.relogin:
+            client.force_login(user)
+        durations, query_counts, statuses, sizes = [], [], {}, []
+        for i in range(warmup + iterations):
+            with transaction.atomic():
+                if user and route.relogin:
+                    client.force_login(user)
+                with contextlib.redirect_stdout(devnull):
+                    (status_code, size), elapsed, queries = timed(lambda: _request(client, route, url, fixtures, i))
+                transaction.set_rollback(True)
+            if i < warmup:
+                continue
+            durations.append(elapsed)
+            query_counts.append(queries)
+            sizes.append(size)
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        results[route.key] = summarize(
+            durations, query_counts, statuses=statuses, bytes=round(sum(sizes) / len(sizes)),
+        )
+    devnull.close()
+    for name in uncovered_routes(routes):
+        results[name] = {'skipped': 'no load profile'}
+    return results
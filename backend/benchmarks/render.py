@@ -0,0 +1,64 @@
+"""
+Payload size and render time for every GET route in the load profiles.
+
+Each route is requested once to capture the data its view returns; then that
+data is rendered repeatedly with DRF's JSONRenderer and with
+core.renderers.FastJSONRenderer, and compressed with gzip and (if installed)
+brotli, to show what each step costs and saves per endpoint.
+"""
+import contextlib
+import gzip
+import os
+import time
+
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.middleware import brotli
+from core.renderers import FastJSONRenderer
+
+from .load import ROUTES
+from .stats import summarize
+
+
+def _render_times(renderer, data, iterations):
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        renderer.render(data)
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def run(fixtures, iterations=50, routes=ROUTES):
+    results = {}
+    devnull = open(os.devnull, 'w')
+    for route in routes:
+        if route.method != 'get':
+            continue
+        client = APIClient()
+        if route.user:
+            client.force_login(fixtures[route.user])
+        url = reverse(route.name, kwargs=route.kwargs(fixtures))
+        with transaction.atomic(), contextlib.redirect_stdout(devnull):
+            response = client.get(url, route.data(fixtures, 0))
+            transaction.set_rollback(True)
+        data = getattr(response, 'data', None)
+        if response.streaming or data is None:
+            results[route.key] = {'skipped': 'not a DRF response'}
+            continue
+
+        body = JSONRenderer().render(data)
+        result = {
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body)),
+            'json_render': _render_times(JSONRenderer(), data, iterations),
+            'fast_render': _render_times(FastJSONRenderer(), data, iterations),
+        }
+        if brotli is not None:
+            result['br_bytes'] = len(brotli.compress(body, quality=5))
+        results[route.key] = result
+    devnull.close()
+    return results
@@ -0,0 +1,67 @@
+"""Writing benchmark reports and comparing them against a stored baseline."""
+import json
+import platform
+import time
+
+import django
+from django.db import connection
+
+# Metrics compared against the baseline; for all of them lower is better
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes')
+
+
+def build(sections, **meta):
+    return {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            **meta,
+        },
+        **sections,
+    }
+
+
+def write(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(report, baseline, threshold=0.2):
+    """
+    Returns one row per (section, case, metric) present in both reports:
+    (section, case, metric, baseline value, current value, relative change, regressed).
+    A metric regresses when it grew by more than `threshold` (0.2 = 20%).
+    Query counts and payload sizes regress on any increase.
+    """
+    rows = []
+    for section, cases in report.items():
+        if section == 'meta' or section not in baseline:
+            continue
+        for case, current in cases.items():
+            previous = baseline[section].get(case)
+            if not previous:
+                continue
+            for metric in COMPARED_METRICS:
+                if current.get(metric) is None or previous.get(metric) is None:
+                    continue
+                old, new = previous[metric], current[metric]
+                change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+                limit = 0 if metric in ('queries', 'bytes') else threshold
+                rows.append((section, case, metric, old, new, change, change > limit))
+    return rows
+
+
+def format_comparison(rows):
+    lines = []
+    for section, case, metric, old, new, change, regressed in rows:
+        marker = 'REGRESSION' if regressed else ''
+        lines.append(f'{section:<12} {case:<40} {metric:<8} {old:>10} -> {new:<10} {change:+8.1%} {marker}')
+    return '\n'.join(lines)
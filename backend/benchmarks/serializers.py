@@ -0,0 +1,76 @@
+"""
+Micro-benchmarks for every serializer in core.serializers.
+
+Each case builds its input once and then times only serialization (`.data`) or
+validation (`.is_valid()`), so the numbers move with serializer changes rather
+than with query plans.
+"""
+import inspect
+
+from rest_framework import serializers as drf_serializers
+
+from core import serializers as core_serializers
+from core.models import User, Item, Swap
+
+from .stats import summarize, timed
+
+
+def serializer_cases(fixtures, list_size):
+    """Maps a case name to (serializer class, zero-argument callable that does the work)."""
+    users = list(User.objects.all()[:list_size])
+    items = list(Item.objects.select_related('uploader')[:list_size])
+    swaps = list(Swap.objects.select_related('user', 'item__uploader', 'requested_item__uploader')[:list_size])
+    owner = fixtures['owner']
+    item_row = {'title': 'Denim jacket', 'description': 'Lightly worn', 'point_value': '40', 'uploader_email': owner.email}
+
+    return {
+        'UserSerializer.one': (core_serializers.UserSerializer, lambda: core_serializers.UserSerializer(owner).data),
+        'UserSerializer.many': (core_serializers.UserSerializer, lambda: core_serializers.UserSerializer(users, many=True).data),
+        'ItemSerializer.one': (core_serializers.ItemSerializer, lambda: core_serializers.ItemSerializer(items[0]).data),
+        'ItemSerializer.many': (core_serializers.ItemSerializer, lambda: core_serializers.ItemSerializer(items, many=True).data),
+        'SwapSerializer.one': (core_serializers.SwapSerializer, lambda: core_serializers.SwapSerializer(swaps[0]).data),
+        'SwapSerializer.many': (core_serializers.SwapSerializer, lambda: core_serializers.SwapSerializer(swaps, many=True).data),
+        'UserRegistrationSerializer.validate': (
+            core_serializers.UserRegistrationSerializer,
+            lambda: core_serializers.UserRegistrationSerializer(
+                data={'email': 'new@example.com', 'username': 'new', 'password': 'x'}
+            ).is_valid(),
+        ),
+        'LoginSerializer.validate': (
+            core_serializers.LoginSerializer,
+            lambda: core_serializers.LoginSerializer(
+                data={'email': owner.email, 'password': fixtures['password']}
+            ).is_valid(),
+        ),
+        'ItemImportSerializer.validate': (
+            core_serializers.ItemImportSerializer,
+            lambda: core_serializers.ItemImportSerializer(data=item_row).is_valid(),
+        ),
+    }
+
+
+def uncovered_serializers(cases):
+    """Serializer classes defined in core.serializers that no case exercises."""
+    covered = {serializer_class for serializer_class, _ in cases.values()}
+    return sorted(
+        name for name, obj in vars(core_serializers).items()
+        if inspect.isclass(obj) and issubclass(obj, drf_serializers.BaseSerializer)
+        and obj.__module__ == core_serializers.__name__ and obj not in covered
+    )
+
+
+def run(fixtures, iterations=200, list_size=100, warmup=5):
+    cases = serializer_cases(fixtures, list_size)
+    results = {}
+    for name, (_, work) in cases.items():
+        for _ in range(warmup):
+            work()
+        durations, query_counts = [], []
+        for _ in range(iterations):
+            _, elapsed, queries = timed(work)
+            durations.append(elapsed)
+            query_counts.append(queries)
+        results[name] = summarize(durations, query_counts)
+    for name in uncovered_serializers(cases):
+        results[name] = {'skipped': 'no benchmark case'}
+    return results
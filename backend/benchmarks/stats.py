@@ -0,0 +1,43 @@
+import math
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def summarize(durations, query_counts=None, **extra):
+    """Turns per-operation durations (seconds) into the numbers stored in a report."""
+    durations = sorted(durations)
+    total = sum(durations)
+    summary = {
+        'iterations': len(durations),
+        'throughput_per_s': round(len(durations) / total, 2) if total else None,
+        'mean_ms': round(total / len(durations) * 1000, 3) if durations else None,
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 95) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+    }
+    if query_counts:
+        summary['queries'] = round(sum(query_counts) / len(query_counts), 2)
+        summary['max_queries'] = max(query_counts)
+    summary.update(extra)
+    return summary
+
+
+def timed(fn):
+    """Runs fn() once and returns (result, seconds, number of queries)."""
+    # The query log is capped, so a full log would make every count read as 0
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+    return result, elapsed, len(queries)
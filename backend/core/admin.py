@@ -1,27 +1,150 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+from . import facets, services
+from .concurrency import VersionConflict
 from .models import User, Item, Swap
 
+# Below this many rows an exact COUNT(*) is cheap enough to always run
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+def estimated_row_count(model):
+    """The planner's row estimate for `model`'s table, or None if the database has none."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == 'sqlite':
+            # Filled in by ANALYZE; the first number of each index's stat is the table's row count
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None # never analyzed
+            cursor.execute("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner's row estimate as the count of an unfiltered changelist on
+    a big table, instead of a COUNT(*) that reads the whole table on every page.
+    Filtered and small lists are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = estimated_row_count(query.model)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+class FastChangeListMixin:
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) Django runs for "x of y selected" on filtered lists
+    show_full_result_count = False
+
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(FastChangeListMixin, UserAdmin):
     list_display = ['email', 'username', 'points', 'is_staff']
     list_filter = ['is_staff', 'is_superuser']
     search_fields = ['email', 'username']
-    
+
     fieldsets = UserAdmin.fieldsets + (
         ('Custom Fields', {'fields': ('points',)}),
     )
 
 @admin.register(Item)
-class ItemAdmin(admin.ModelAdmin):
-    list_display = ['title', 'uploader', 'featured', 'available', 'created_at']
-    list_filter = ['featured', 'available', 'created_at']
+class ItemAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ['title', 'uploader', 'moderation_status', 'featured', 'available', 'created_at']
+    list_filter = ['moderation_status', 'featured', 'available', 'created_at']
     search_fields = ['title', 'description']
-    list_editable = ['featured', 'available']
+    list_select_related = ['uploader']
+    autocomplete_fields = ['uploader']
+    # Newest first by primary key, which is indexed, rather than by created_at, which isn't on its own
+    ordering = ['-pk']
+    # Bulk actions instead of list_editable, which saves every row on the page one by one
+    actions = ['approve_items', 'reject_items', 'mark_featured', 'unmark_featured', 'mark_available', 'mark_unavailable']
+
+    def _moderate(self, request, queryset, moderation_status):
+        try:
+            with transaction.atomic():
+                changed = services.moderate_items(queryset, moderation_status, actor=request.user)
+        except VersionConflict:
+            self.message_user(request, "Some of the items were changed by someone else meanwhile. Nothing was changed; try again.", messages.ERROR)
+            return
+        self.message_user(request, f"{changed} items {moderation_status}.", messages.SUCCESS)
+
+    def _set_flag(self, request, queryset, field, value):
+        # One UPDATE for the whole selection. It bypasses Item.save(), so move the
+        # versions on and keep the facet counts right by hand.
+        item_ids = list(queryset.exclude(**{field: value}).values_list('id', flat=True))
+        with transaction.atomic(), facets.track(item_ids):
+            changed = Item.objects.filter(pk__in=item_ids).update(version=F('version') + 1, **{field: value})
+        self.message_user(request, f"{changed} items updated.", messages.SUCCESS)
+
+    @admin.action(description="Approve selected items")
+    def approve_items(self, request, queryset):
+        self._moderate(request, queryset, 'approved')
+
+    @admin.action(description="Reject selected items")
+    def reject_items(self, request, queryset):
+        self._moderate(request, queryset, 'rejected')
+
+    @admin.action(description="Feature selected items")
+    def mark_featured(self, request, queryset):
+        self._set_flag(request, queryset, 'featured', True)
+
+    @admin.action(description="Stop featuring selected items")
+    def unmark_featured(self, request, queryset):
+        self._set_flag(request, queryset, 'featured', False)
+
+    @admin.action(description="Mark selected items available")
+    def mark_available(self, request, queryset):
+        self._set_flag(request, queryset, 'available', True)
+
+    @admin.action(description="Mark selected items unavailable")
+    def mark_unavailable(self, request, queryset):
+        self._set_flag(request, queryset, 'available', False)
 
 @admin.register(Swap)
-class SwapAdmin(admin.ModelAdmin):
-    list_display = ['user', 'item', 'status', 'created_at']
+class SwapAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ['user', 'item', 'requested_item', 'status', 'created_at', 'resolved_at']
     list_filter = ['status', 'created_at']
     search_fields = ['user__email', 'item__title']
-    list_editable = ['status']
+    # Swap.__str__ and the user/item columns read these; without them every row costs extra queries
+    list_select_related = ['user', 'item__uploader', 'requested_item']
+    autocomplete_fields = ['user', 'item', 'requested_item']
+    ordering = ['-pk']
+    # Status changes go through the actions, which move items and points like the API does
+    readonly_fields = ['status', 'resolved_at']
+    actions = ['approve_swaps', 'reject_swaps']
+
+    def _resolve(self, request, queryset, resolve, done):
+        # Each swap is resolved in its own transaction: approving one can reject others,
+        # and one lost race shouldn't undo the rest.
+        resolved, skipped = 0, 0
+        for swap in queryset.filter(status='pending').select_related('user', 'item__uploader', 'requested_item'):
+            try:
+                with transaction.atomic():
+                    resolve(swap, actor=request.user)
+                resolved += 1
+            except VersionConflict:
+                # Already resolved, e.g. rejected by an approval earlier in this loop
+                skipped += 1
+        self.message_user(request, f"{resolved} swaps {done}.", messages.SUCCESS)
+        if skipped:
+            self.message_user(request, f"{skipped} swaps were no longer pending and were skipped.", messages.WARNING)
+
+    @admin.action(description="Approve selected pending swaps")
+    def approve_swaps(self, request, queryset):
+        self._resolve(request, queryset, services.approve_swap, 'approved')
+
+    @admin.action(description="Reject selected pending swaps")
+    def reject_swaps(self, request, queryset):
+        self._resolve(request, queryset, services.reject_swap, 'rejected')
@@ -0,0 +1,64 @@
+"""
+Moves finished swaps from the Swap table into SwapArchive.
+
+Each batch is copied and deleted in its own transaction, so the command can
+be stopped at any point and run again; nothing is lost or copied twice.
+"""
+from django.db import transaction
+
+from .models import Swap, SwapArchive
+
+DEFAULT_BATCH_SIZE = 1000
+
+ARCHIVE_VALUES = (
+    'id', 'user_id', 'item__uploader_id', 'item_id', 'item__title',
+    'requested_item_id', 'requested_item__title', 'item__point_value', 'status', 'created_at', 'resolved_at',
+)
+
+
+def archivable_swaps(cutoff, statuses=Swap.TERMINAL_STATUSES):
+    # By when they were resolved: a swap requested long ago may have been approved today
+    return Swap.objects.filter(status__in=statuses, resolved_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size=DEFAULT_BATCH_SIZE, statuses=Swap.TERMINAL_STATUSES):
+    """Archives up to `batch_size` swaps. Returns how many were moved."""
+    with transaction.atomic():
+        rows = list(
+            archivable_swaps(cutoff, statuses).order_by('id').values_list(*ARCHIVE_VALUES)[:batch_size]
+        )
+        if not rows:
+            return 0
+        SwapArchive.objects.bulk_create(
+            [
+                SwapArchive(
+                    swap_id=swap_id,
+                    user_id=user_id,
+                    item_uploader_id=item_uploader_id,
+                    item_id=item_id,
+                    item_title=item_title,
+                    requested_item_id=requested_item_id,
+                    requested_item_title=requested_item_title or '',
+                    point_value=point_value,
+                    status=status,
+                    created_at=created_at,
+                    resolved_at=resolved_at,
+                )
+                for (swap_id, user_id, item_uploader_id, item_id, item_title,
+                     requested_item_id, requested_item_title, point_value, status, created_at, resolved_at) in rows
+            ],
+            ignore_conflicts=True, # already archived by an earlier run
+        )
+        Swap.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_swaps(cutoff, batch_size=DEFAULT_BATCH_SIZE, statuses=Swap.TERMINAL_STATUSES, max_batches=None):
+    """Archives batches until nothing older than `cutoff` is left. Yields each batch size."""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size, statuses)
+        if not moved:
+            return
+        batches += 1
+        yield moved
@@ -0,0 +1,258 @@
+"""
+Bulk import and export of items, shared by the `import_items` / `export_items`
+management commands and the moderator import/export endpoints.
+
+Rows are plain dicts using the columns in ITEM_COLUMNS, read from and written
+to NDJSON (one JSON object per line) or CSV.
+"""
+import csv
+import io
+import json
+import os
+import posixpath
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from . import facets
+from .models import User, Item
+from .serializers import ItemImportSerializer
+
+FORMATS = ('ndjson', 'csv')
+
+# Columns written by export and understood by import, in CSV column order
+ITEM_COLUMNS = [
+    'id', 'title', 'description', 'point_value', 'featured', 'available',
+    'moderation_status', 'uploader_email', 'image', 'created_at', 'latitude', 'longitude',
+]
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WORKERS = 8
+IMAGE_FETCH_TIMEOUT = 30 # seconds
+
+
+def guess_format(filename, default='ndjson'):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    return default
+
+
+def read_rows(stream, fmt):
+    """
+    Yields (row_number, row) pairs from a text stream. Row numbers start at 1
+    and count data rows only, so they can be used as a resume position.
+    Lines that can't be parsed are yielded as (row_number, None).
+    """
+    if fmt == 'csv':
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            # Blank CSV cells mean "not provided", not an empty string
+            yield row_number, {key: value for key, value in row.items() if key and value != ''}
+        return
+
+    row_number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None
+            continue
+        yield row_number, row if isinstance(row, dict) else None
+
+
+def load_image_manifest(path):
+    """Reads a CSV (`ref,url`) or JSON object mapping image refs to URLs or paths."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if guess_format(path, default='csv') == 'csv':
+            return {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2 and row[0] != 'ref'}
+        return json.load(f)
+
+
+class ImageResolver:
+    """
+    Turns the `image` value of an import row into a stored file name.
+
+    A ref is first looked up in the manifest (if any). Files are read relative
+    to `image_dir`, and URLs are downloaded only with `fetch_urls` (the
+    management command; the staff endpoint must not make the server fetch
+    arbitrary addresses). Without an `image_dir`, a plain ref is taken to be a
+    name already in media storage, which is what an export from another
+    ReWear instance produces; with `check_storage` it must exist there.
+
+    Returns (name, stored), where `stored` is True for a file this call saved.
+    """
+
+    def __init__(self, image_dir=None, manifest=None, fetch_urls=False, check_storage=False):
+        self.image_dir = image_dir
+        self.manifest = manifest or {}
+        self.fetch_urls = fetch_urls
+        self.check_storage = check_storage
+        self.field = Item._meta.get_field('image')
+
+    def __call__(self, ref):
+        source = self.manifest.get(ref, ref)
+        if urlparse(source).scheme in ('http', 'https'):
+            if not self.fetch_urls:
+                raise ValueError('Image URLs are only fetched by the import_items command.')
+            with urllib.request.urlopen(source, timeout=IMAGE_FETCH_TIMEOUT) as response:
+                content = response.read()
+            basename = posixpath.basename(urlparse(source).path) or 'image'
+        elif self.image_dir or source != ref:
+            path = os.path.join(self.image_dir or '', source)
+            with open(path, 'rb') as f:
+                content = f.read()
+            basename = os.path.basename(path)
+        else:
+            if self.check_storage and not self.field.storage.exists(ref):
+                raise ValueError(f'No stored image named {ref}.')
+            return ref, False
+        name = self.field.generate_filename(None, basename)
+        return self.field.storage.save(name, ContentFile(content)), True
+
+    def delete(self, names):
+        for name in names:
+            self.field.storage.delete(name)
+
+
+def import_items(rows, default_uploader=None, image_resolver=None, start=0,
+                 batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, on_batch=None):
+    """
+    Creates items from (row_number, row) pairs with `bulk_create`, one
+    transaction per batch.
+
+    Rows numbered `start` or lower are skipped, so an interrupted import can
+    be resumed from the last committed row. `on_batch(last_row, created)` is
+    called after each batch commits. Invalid rows don't stop the import; they
+    are collected into the returned report as {'row': n, 'errors': ...}.
+
+    A file that can't be read any further (bad encoding, broken CSV quoting)
+    ends the import after the rows read so far; the report then has an
+    'error', and its `last_row` is where to resume once the file is fixed.
+    """
+    image_resolver = image_resolver or ImageResolver()
+    report = {'created': 0, 'errors': [], 'last_row': start}
+    batch = []
+    read_up_to = start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for row_number, row in rows:
+                if row_number <= start:
+                    continue
+                read_up_to = row_number
+                batch.append((row_number, row))
+                if len(batch) >= batch_size:
+                    _import_batch(batch, default_uploader, image_resolver, pool, report, on_batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            report['error'] = f'Could not read the file after row {read_up_to}: {exc}'
+        if batch:
+            _import_batch(batch, default_uploader, image_resolver, pool, report, on_batch)
+
+    return report
+
+
+def _import_batch(batch, default_uploader, image_resolver, pool, report, on_batch):
+    valid = []
+    for row_number, row in batch:
+        if row is None:
+            report['errors'].append({'row': row_number, 'errors': {'row': ['Could not parse row.']}})
+            continue
+        serializer = ItemImportSerializer(data=row)
+        if not serializer.is_valid():
+            report['errors'].append({'row': row_number, 'errors': serializer.errors})
+            continue
+        valid.append((row_number, serializer.validated_data))
+
+    # Resolve all uploaders in the batch with one query
+    emails = {data['uploader_email'] for _, data in valid if data.get('uploader_email')}
+    uploaders = {user.email: user for user in User.objects.filter(email__in=emails)}
+
+    rows = []
+    for row_number, data in valid:
+        email = data.pop('uploader_email', None)
+        uploader = uploaders.get(email) if email else default_uploader
+        if uploader is None:
+            message = f'No user with email {email}.' if email else 'No uploader given.'
+            report['errors'].append({'row': row_number, 'errors': {'uploader_email': [message]}})
+            continue
+        rows.append((row_number, uploader, data))
+
+    # Fetch and store images in parallel; these are I/O bound. Only rows that are
+    # otherwise valid get theirs stored, so a bad row leaves no file behind.
+    futures = {
+        row_number: pool.submit(image_resolver, data['image'])
+        for row_number, _, data in rows if data.get('image')
+    }
+
+    items = []
+    stored = [] # files saved for this batch, deleted again if it doesn't commit
+    for row_number, uploader, data in rows:
+        image = data.pop('image', None)
+        if row_number in futures:
+            try:
+                image, saved = futures[row_number].result()
+            except Exception as exc:
+                report['errors'].append({'row': row_number, 'errors': {'image': [str(exc)]}})
+                continue
+            if saved:
+                stored.append(image)
+        if data.get('latitude') is None:
+            # Like items created through the API, default to the uploader's location
+            data['latitude'], data['longitude'] = uploader.latitude, uploader.longitude
+        item = Item(uploader=uploader, image=image, **data)
+        item.sync_geohash() # bulk_create doesn't call save()
+        items.append(item)
+
+    try:
+        with transaction.atomic():
+            Item.objects.bulk_create(items)
+            facets.record_created(items)
+    except Exception:
+        image_resolver.delete(stored)
+        raise
+
+    report['created'] += len(items)
+    report['last_row'] = batch[-1][0]
+    print(f"Imported batch up to row {report['last_row']}: {len(items)} items created.")
+    if on_batch:
+        on_batch(report['last_row'], len(items))
+
+
+def export_rows(queryset):
+    """Yields export rows for `queryset` without holding the whole table in memory."""
+    values = queryset.values_list(
+        'id', 'title', 'description', 'point_value', 'featured', 'available',
+        'moderation_status', 'uploader__email', 'image', 'created_at', 'latitude', 'longitude',
+    ).order_by('id')
+    for values_row in values.iterator(chunk_size=2000):
+        row = dict(zip(ITEM_COLUMNS, values_row))
+        row['created_at'] = row['created_at'].isoformat()
+        yield row
+
+
+def export_lines(queryset, fmt):
+    """Yields the export of `queryset` as NDJSON or CSV text, one line at a time."""
+    rows = export_rows(queryset)
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(row) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=ITEM_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
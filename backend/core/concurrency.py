@@ -0,0 +1,126 @@
+"""
+Optimistic concurrency for models with a `version` column (Item, Swap).
+
+Writes go through `versioned_update`, which issues
+UPDATE ... SET version = version + 1 WHERE pk = %s AND version = %s
+for just the changed columns, so two writers that read the same version can't
+both succeed and no row stays locked while a request runs. Clients can send
+the version they last saw as `If-Match: "<version>"` (it is returned in the
+ETag header) and get a 412 if someone else changed the row since.
+"""
+import re
+
+from django.db.models import F, Q
+from django.db.models.signals import pre_save, post_save
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+ETAG_RE = re.compile(r'^(?:W/)?"(\d+)"$')
+
+BULK_CHUNK_SIZE = 200
+
+
+class VersionConflict(Exception):
+    """The row changed (or disappeared) since its version was read."""
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'This object was changed by someone else. Reload it and try again.'
+    default_code = 'precondition_failed'
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This object was changed by someone else while your request was running. Try again.'
+    default_code = 'conflict'
+
+
+def etag(instance):
+    return f'"{instance.version}"'
+
+
+def with_etag(response, instance):
+    response['ETag'] = etag(instance)
+    return response
+
+
+def if_match_version(request):
+    """
+    The version the client expects from its If-Match header, or None when it
+    sent none (or `*`). A header that isn't one of our ETags can never match.
+    """
+    header = request.headers.get('If-Match')
+    if header is None or header.strip() == '*':
+        return None
+    match = ETAG_RE.match(header.strip())
+    if not match:
+        raise PreconditionFailed()
+    return int(match.group(1))
+
+
+def check_if_match(request, instance):
+    """
+    Raises PreconditionFailed if the client's If-Match doesn't match `instance`.
+    Returns the version the write should be conditional on.
+    """
+    expected = if_match_version(request)
+    if expected is not None and expected != instance.version:
+        raise PreconditionFailed()
+    return instance.version
+
+
+def conflict_error(request):
+    # With If-Match the client asked for a precondition, so a lost race is a 412
+    return PreconditionFailed() if request.headers.get('If-Match') else Conflict()
+
+
+def versioned_update(instance, update_fields, expected_version=None, **conditions):
+    """
+    Writes `update_fields` of `instance` only if its row still has
+    `expected_version` (default: instance.version) and matches `conditions`,
+    bumping the version. Raises VersionConflict otherwise.
+
+    Only the listed columns are written. pre_save/post_save are sent as for a
+    regular save(update_fields=...), so signal receivers keep working.
+    """
+    model = type(instance)
+    expected = instance.version if expected_version is None else expected_version
+    update_fields = [name for name in update_fields if name != 'version']
+
+    pre_save.send(sender=model, instance=instance, raw=False, using=instance._state.db,
+                  update_fields=frozenset(update_fields))
+    values = {}
+    for name in update_fields:
+        field = model._meta.get_field(name)
+        values[field.attname] = field.pre_save(instance, False)
+
+    updated = model._default_manager.filter(pk=instance.pk, version=expected, **conditions).update(
+        version=F('version') + 1, **values
+    )
+    if not updated:
+        raise VersionConflict(f'{model.__name__} {instance.pk} is no longer at version {expected}.')
+
+    instance.version = expected + 1
+    post_save.send(sender=model, instance=instance, created=False, raw=False, using=instance._state.db,
+                   update_fields=frozenset(update_fields + ['version']))
+    return instance
+
+
+def bulk_versioned_update(model, versions, **values):
+    """
+    Applies `values` to every row in `versions` (a {pk: version} dict) with
+    one UPDATE per BULK_CHUNK_SIZE rows, bumping each version. Raises VersionConflict unless every row
+    still had the version it was read with. Sends no signals.
+    """
+    updated = 0
+    pairs = list(versions.items())
+    # Chunked so the OR'ed conditions stay within database expression limits
+    for start in range(0, len(pairs), BULK_CHUNK_SIZE):
+        condition = Q()
+        for pk, version in pairs[start:start + BULK_CHUNK_SIZE]:
+            condition |= Q(pk=pk, version=version)
+        updated += model._default_manager.filter(condition).update(version=F('version') + 1, **values)
+    if updated != len(versions):
+        raise VersionConflict(f'{len(versions) - updated} {model.__name__} rows changed concurrently.')
+    return updated
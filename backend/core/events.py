@@ -0,0 +1,99 @@
+"""
+The domain event log.
+
+Every swap, moderation and points change appends a DomainEvent in the same
+transaction as the change itself, so the log and the live tables can't
+disagree. Events are never updated or deleted; read models are built from
+them by the projectors in core.projections. A `run_projections --follow`
+worker keeps them up to date, off the request path. With
+PROJECTIONS_RUN_ON_COMMIT on (for development and single-process setups),
+each transaction that records events also catches them up after it commits.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import DomainEvent
+
+SWAP_REQUESTED = 'swap.requested'
+SWAP_APPROVED = 'swap.approved'
+SWAP_REJECTED = 'swap.rejected'
+ITEM_APPROVED = 'item.approved'
+ITEM_REJECTED = 'item.rejected'
+POINTS_CHANGED = 'points.changed'
+
+SWAP_EVENTS = (SWAP_REQUESTED, SWAP_APPROVED, SWAP_REJECTED)
+ITEM_EVENTS = (ITEM_APPROVED, ITEM_REJECTED)
+
+
+def swap_event(type, swap, actor=None, **data):
+    """An unsaved event for `swap`, which needs its item and requested_item loaded."""
+    return swap_event_from_values(
+        type, actor,
+        swap_id=swap.id,
+        requester_id=swap.user_id,
+        owner_id=swap.item.uploader_id,
+        item_id=swap.item_id,
+        item_title=swap.item.title,
+        requested_item_id=swap.requested_item_id,
+        requested_item_title=swap.requested_item.title if swap.requested_item else None,
+        point_value=swap.item.point_value,
+        **data,
+    )
+
+
+def swap_event_from_values(type, actor, swap_id, item_id, **data):
+    return DomainEvent(
+        type=type,
+        actor_id=getattr(actor, 'pk', actor),
+        swap_id=swap_id,
+        item_id=item_id,
+        data=data,
+    )
+
+
+def item_event(type, item, actor=None):
+    return item_event_from_values(type, actor, item.id, item.uploader_id, item.title)
+
+
+def item_event_from_values(type, actor, item_id, uploader_id, item_title):
+    return DomainEvent(
+        type=type,
+        actor_id=getattr(actor, 'pk', actor),
+        item_id=item_id,
+        data={'uploader_id': uploader_id, 'item_title': item_title},
+    )
+
+
+def points_event(user_id, delta, reason, swap_id=None, actor=None):
+    # reason: 'redemption', 'refund', 'swap_reward' or 'redemption_payout'
+    return DomainEvent(
+        type=POINTS_CHANGED,
+        actor_id=getattr(actor, 'pk', actor),
+        swap_id=swap_id,
+        data={'user_id': user_id, 'delta': delta, 'reason': reason},
+    )
+
+
+def record(*events):
+    """
+    Appends `events` to the log. Must run inside the transaction that makes
+    the change they describe.
+    """
+    if len(events) == 1:
+        events[0].save()
+    else:
+        DomainEvent.objects.bulk_create(events)
+    if events and getattr(settings, 'PROJECTIONS_RUN_ON_COMMIT', False):
+        # One catch-up per transaction, however many times it records events. The
+        # pending callbacks are checked rather than a flag kept, so a rolled back
+        # savepoint (which drops its callbacks) doesn't leave a stale one.
+        pending = transaction.get_connection().run_on_commit
+        if not any(func is _catch_up_after_commit for _, func, _ in pending):
+            # robust: the change is already committed, a failing projector must not turn it into an error
+            transaction.on_commit(_catch_up_after_commit, robust=True)
+    return events
+
+
+def _catch_up_after_commit():
+    from .projections import catch_up
+    catch_up()
@@ -0,0 +1,245 @@
+"""
+Facet counts for the public catalog (approved and available items).
+
+Counts live in ItemFacetCount, one row per (facet, value), and are adjusted by
+the item signals in core.signals whenever an item is saved or deleted. Code
+that writes items in bulk (queryset.update, bulk_create) bypasses signals and
+must wrap the write in `track()` or call `record_created()` instead.
+`rebuild()` recomputes everything from the Item table.
+"""
+import datetime
+from collections import Counter
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import User, Item, ItemFacetCount
+
+# (label, lowest point_value, highest point_value or None)
+POINT_BUCKETS = [
+    ('0-49', 0, 49),
+    ('50-99', 50, 99),
+    ('100-199', 100, 199),
+    ('200+', 200, None),
+]
+
+# Recency windows in days, counted from the start of today
+RECENCY_WINDOWS = {'1d': 1, '7d': 7, '30d': 30}
+
+TOP_UPLOADERS = 20
+
+# Whole numbers in query parameters must fit the database's 64-bit integers
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+
+# Columns needed to work out an item's facet keys, in keys_for() argument order
+STATE_FIELDS = ('available', 'moderation_status', 'point_value', 'uploader_id', 'created_at')
+
+
+def point_bucket(point_value):
+    for label, low, high in POINT_BUCKETS:
+        if point_value >= low and (high is None or point_value <= high):
+            return label
+    return None
+
+
+def keys_for(available, moderation_status, point_value, uploader_id, created_at):
+    """The (facet, value) pairs an item is counted under. Hidden items count nowhere."""
+    if not available or moderation_status != 'approved':
+        return []
+    keys = [
+        ('all', ''),
+        ('redeemable', 'false' if point_value is None else 'true'),
+        ('uploader', str(uploader_id)),
+        ('created', timezone.localdate(created_at).isoformat()),
+    ]
+    if point_value is not None and point_bucket(point_value):
+        keys.append(('points', point_bucket(point_value)))
+    return keys
+
+
+def keys_for_item(item):
+    return keys_for(*(getattr(item, field) for field in STATE_FIELDS))
+
+
+def apply(before, after, count_model=ItemFacetCount):
+    """Moves counts from the `before` keys to the `after` keys in a few bulk queries."""
+    delta = Counter(after)
+    delta.subtract(before)
+    delta = {key: change for key, change in delta.items() if change}
+    if not delta:
+        return
+
+    count_model.objects.bulk_create(
+        [count_model(facet=facet, value=value, count=0) for facet, value in delta],
+        ignore_conflicts=True,
+    )
+    # One UPDATE per distinct change, which is usually just +1 and -1
+    keys_by_change = {}
+    for key, change in delta.items():
+        keys_by_change.setdefault(change, []).append(key)
+    for change, keys in keys_by_change.items():
+        condition = reduce(or_, (Q(facet=facet, value=value) for facet, value in keys))
+        count_model.objects.filter(condition).update(count=F('count') + change)
+
+
+def current_keys(item_ids):
+    return [
+        key
+        for row in Item.objects.filter(pk__in=item_ids).values_list(*STATE_FIELDS)
+        for key in keys_for(*row)
+    ]
+
+
+@contextmanager
+def track(item_ids):
+    """Keeps facet counts right across a bulk write to the items with `item_ids`."""
+    item_ids = list(item_ids)
+    before = current_keys(item_ids)
+    yield
+    apply(before, current_keys(item_ids))
+
+
+def record_created(items):
+    """Counts items that were inserted with bulk_create."""
+    apply([], [key for item in items for key in keys_for_item(item)])
+
+
+def rebuild(item_model=Item, count_model=ItemFacetCount):
+    """Recomputes every count from the item table, streaming it in chunks."""
+    counts = Counter()
+    rows = item_model.objects.filter(available=True, moderation_status='approved').values_list(*STATE_FIELDS)
+    for row in rows.iterator(chunk_size=2000):
+        counts.update(keys_for(*row))
+
+    count_model.objects.all().delete()
+    count_model.objects.bulk_create(
+        [count_model(facet=facet, value=value, count=count) for (facet, value), count in counts.items()],
+        batch_size=1000,
+    )
+    return len(counts)
+
+
+def facet_counts():
+    """Reads the sidebar counts from the summary table."""
+    today = timezone.localdate()
+    oldest_window = (today - datetime.timedelta(days=max(RECENCY_WINDOWS.values()) - 1)).isoformat()
+    rows = ItemFacetCount.objects.filter(count__gt=0).exclude(facet='created', value__lt=oldest_window)
+
+    total = 0
+    redeemable = {'true': 0, 'false': 0}
+    points = {label: 0 for label, _, _ in POINT_BUCKETS}
+    recency = {window: 0 for window in RECENCY_WINDOWS}
+    uploaders = []
+    for facet, value, count in rows.values_list('facet', 'value', 'count'):
+        if facet == 'all':
+            total = count
+        elif facet == 'redeemable':
+            redeemable[value] = count
+        elif facet == 'points':
+            points[value] = count
+        elif facet == 'uploader':
+            uploaders.append((count, int(value)))
+        elif facet == 'created':
+            age = (today - datetime.date.fromisoformat(value)).days
+            for window, days in RECENCY_WINDOWS.items():
+                if age < days:
+                    recency[window] += count
+    recency['older'] = total - recency['30d']
+
+    uploaders = sorted(uploaders, reverse=True)[:TOP_UPLOADERS]
+    usernames = dict(User.objects.filter(pk__in=[pk for _, pk in uploaders]).values_list('id', 'username'))
+    return {
+        'total': total,
+        'redeemable': redeemable,
+        'points': points,
+        'recency': recency,
+        'uploaders': [{'id': pk, 'username': usernames.get(pk), 'count': count} for count, pk in uploaders],
+    }
+
+
+def _bool_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValidationError({name: 'Must be true or false.'})
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be a whole number.'})
+    if not MIN_INT <= value <= MAX_INT:
+        raise ValidationError({name: 'Out of range.'})
+    return value
+
+
+def filter_items(queryset, params):
+    """
+    Applies the facet query parameters to an item queryset:
+
+    - points: one or more bucket labels, comma separated (e.g. points=0-49,50-99)
+    - points_min / points_max: an explicit point range
+    - redeemable: true for items with a point value, false for swap-only items
+    - uploader: one or more uploader ids, comma separated
+    - recency: one of RECENCY_WINDOWS (e.g. recency=7d)
+    - featured: true or false
+    """
+    buckets = [label for label in params.get('points', '').split(',') if label]
+    if buckets:
+        known = {label: (low, high) for label, low, high in POINT_BUCKETS}
+        unknown = [label for label in buckets if label not in known]
+        if unknown:
+            raise ValidationError({'points': f'Unknown bucket(s): {", ".join(unknown)}.'})
+        condition = Q()
+        for label in buckets:
+            low, high = known[label]
+            bucket = Q(point_value__gte=low)
+            if high is not None:
+                bucket &= Q(point_value__lte=high)
+            condition |= bucket
+        queryset = queryset.filter(condition)
+
+    points_min = _int_param(params, 'points_min')
+    if points_min is not None:
+        queryset = queryset.filter(point_value__gte=points_min)
+    points_max = _int_param(params, 'points_max')
+    if points_max is not None:
+        queryset = queryset.filter(point_value__lte=points_max)
+
+    redeemable = _bool_param(params, 'redeemable')
+    if redeemable is not None:
+        queryset = queryset.filter(point_value__isnull=not redeemable)
+
+    uploader_ids = [value for value in params.get('uploader', '').split(',') if value]
+    if uploader_ids:
+        # isdigit() alone also accepts digits like '²', which int() can't parse
+        if not all(value.isascii() and value.isdigit() and int(value) <= MAX_INT for value in uploader_ids):
+            raise ValidationError({'uploader': 'Must be uploader ids.'})
+        queryset = queryset.filter(uploader_id__in=uploader_ids)
+
+    recency = params.get('recency')
+    if recency:
+        if recency not in RECENCY_WINDOWS:
+            raise ValidationError({'recency': f'Must be one of {", ".join(RECENCY_WINDOWS)}.'})
+        since = timezone.localdate() - datetime.timedelta(days=RECENCY_WINDOWS[recency] - 1)
+        # Compare against a datetime rather than created_at__date so the index can be used
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.datetime.combine(since, datetime.time.min)))
+
+    featured = _bool_param(params, 'featured')
+    if featured is not None:
+        queryset = queryset.filter(featured=featured)
+
+    return queryset
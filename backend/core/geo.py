@@ -0,0 +1,231 @@
+"""
+Coarse locations and proximity search for items.
+
+Items (and users) may have a latitude/longitude, rounded to
+COORDINATE_DECIMALS places (about 1 km) so no exact address is ever stored or
+shown. Each located item also stores its geohash: a string that names the grid
+cell the item falls in, where every extra character splits the cell into 32.
+Items in the same cell share a prefix, so "everything in this cell" is a range
+on an indexed string column.
+
+A radius search is turned into the few cells that cover the circle's bounding
+box (`covering_ranges`), fetched with one indexed range lookup each, and then
+filtered exactly with the haversine distance (`nearby`), widening the circle
+step by step until enough objects are found.
+"""
+import math
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+COORDINATE_DECIMALS = 2
+GEOHASH_PRECISION = 6 # about 1.2 x 0.6 km cells, in line with the coordinate rounding
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+# Most cells a search may cover; finer cells than that fall back to a coarser precision
+MAX_COVERING_CELLS = 16
+
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 200
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# nearby() widens its search by this factor at a time, starting from at least MIN_SEARCH_RADIUS_KM
+SEARCH_STEP = 4
+MIN_SEARCH_RADIUS_KM = 1
+
+
+def coarse(value):
+    return None if value is None else round(value, COORDINATE_DECIMALS)
+
+
+def _grid_bits(precision):
+    # Geohash bits alternate longitude, latitude, ..., starting with longitude
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+
+def _cell_index(lat, lng, precision):
+    lng_bits, lat_bits = _grid_bits(precision)
+    x = min(int((lng + 180) / 360 * (1 << lng_bits)), (1 << lng_bits) - 1)
+    y = min(int((lat + 90) / 180 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    return x, y
+
+
+def _hash_for_index(x, y, precision):
+    lng_bits, lat_bits = _grid_bits(precision)
+    code = 0
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            code = (code << 1) | ((x >> (lng_bits - 1 - bit // 2)) & 1)
+        else:
+            code = (code << 1) | ((y >> (lat_bits - 1 - bit // 2)) & 1)
+    return ''.join(BASE32[(code >> shift) & 31] for shift in range(5 * (precision - 1), -1, -5))
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    """The geohash of a point, or '' when the location is unknown."""
+    if lat is None or lng is None:
+        return ''
+    return _hash_for_index(*_cell_index(lat, lng, precision), precision)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    (south, north, west, east) around a circle. west > east means the box
+    crosses the antimeridian; a box reaching a pole spans every longitude.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if south == -90.0 or north == 90.0:
+        return south, north, -180.0, 180.0
+    dlng = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+    if dlng >= 180:
+        return south, north, -180.0, 180.0
+    west, east = lng - dlng, lng + dlng
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, north, west, east
+
+
+def covering_cells(box, max_cells=MAX_COVERING_CELLS):
+    """The geohashes of the finest cells (at most `max_cells` of them) that cover `box`."""
+    south, north, west, east = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lng_bits, _ = _grid_bits(precision)
+        columns = 1 << lng_bits
+        x_west, y_south = _cell_index(south, west, precision)
+        x_east, y_north = _cell_index(north, east, precision)
+        if west == -180.0 and east == 180.0:
+            xs = range(columns)
+        else:
+            xs = [x % columns for x in range(x_west, x_east + 1 if x_east >= x_west else x_east + columns + 1)]
+        ys = range(y_south, y_north + 1)
+        if len(xs) * len(ys) <= max_cells or precision == 1:
+            return sorted(_hash_for_index(x, y, precision) for x in xs for y in ys)
+
+
+def _successor(prefix):
+    """The smallest string sorting after every string that starts with `prefix`, or None."""
+    while prefix and prefix[-1] == BASE32[-1]:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + BASE32[BASE32.index(prefix[-1]) + 1]
+
+
+def covering_ranges(box, max_cells=MAX_COVERING_CELLS):
+    """
+    The cells covering `box` as [start, end) geohash ranges, with neighbouring
+    cells that sort next to each other merged into one range. `end` is None
+    when the range runs to the end of the keyspace.
+    """
+    ranges = []
+    for cell in covering_cells(box, max_cells):
+        end = _successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = end
+        else:
+            ranges.append([cell, end])
+    return [tuple(r) for r in ranges]
+
+
+def covering_condition(box, field='geohash'):
+    condition = Q()
+    for start, end in covering_ranges(box):
+        cell = Q(**{f'{field}__gte': start})
+        if end is not None:
+            cell &= Q(**{f'{field}__lt': end})
+        condition |= cell
+    return condition
+
+
+def _float_param(params, name, low, high, default=None):
+    value = params.get(name)
+    if value is None or value == '':
+        if default is None:
+            raise ValidationError({name: 'This parameter is required.'})
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be a number.'})
+    if not low <= value <= high or math.isnan(value):
+        raise ValidationError({name: f'Must be between {low} and {high}.'})
+    return value
+
+
+def parse_nearby_params(params):
+    """Reads lat, lng, radius (km) and limit from the query string."""
+    lat = _float_param(params, 'lat', -90, 90)
+    lng = _float_param(params, 'lng', -180, 180)
+    radius = _float_param(params, 'radius', 0, MAX_RADIUS_KM, DEFAULT_RADIUS_KM)
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = None
+    if limit is None or not 1 <= limit <= MAX_LIMIT:
+        raise ValidationError({'limit': f'Must be a whole number between 1 and {MAX_LIMIT}.'})
+    return lat, lng, radius, limit
+
+
+def candidates(queryset, lat, lng, radius_km):
+    """Narrows `queryset` to the covering cells and bounding box of the circle."""
+    box = bounding_box(lat, lng, radius_km)
+    south, north, west, east = box
+    queryset = queryset.filter(covering_condition(box), latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        return queryset.filter(longitude__gte=west, longitude__lte=east)
+    return queryset.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def _within(queryset, lat, lng, radius_km):
+    distances = []
+    rows = candidates(queryset, lat, lng, radius_km).values_list('pk', 'latitude', 'longitude').order_by()
+    for pk, item_lat, item_lng in rows:
+        distance = haversine_km(lat, lng, item_lat, item_lng)
+        if distance <= radius_km:
+            distances.append((distance, pk))
+    return sorted(distances)
+
+
+def search_radii(radius_km):
+    """radius_km and the smaller radii tried before it, smallest first."""
+    radii = [radius_km]
+    while radii[-1] / SEARCH_STEP >= MIN_SEARCH_RADIUS_KM:
+        radii.append(radii[-1] / SEARCH_STEP)
+    return radii[::-1]
+
+
+def nearby(queryset, lat, lng, radius_km, limit=DEFAULT_LIMIT):
+    """
+    The `limit` closest objects in `queryset` within `radius_km` of (lat, lng),
+    nearest first, as (object, distance_km) pairs.
+
+    Candidates come from a range lookup per covering cell plus a bounding box
+    check, reading only id and coordinates. The exact distance is computed for
+    those, and only the rows that make the cut are loaded in full. In dense
+    areas the closest `limit` are usually within a fraction of the radius, so
+    smaller circles are searched first (see search_radii) and the search stops
+    as soon as one holds `limit` objects.
+    """
+    for search_radius in search_radii(radius_km):
+        distances = _within(queryset, lat, lng, search_radius)
+        if len(distances) >= limit:
+            break
+    distances = distances[:limit]
+
+    objects = queryset.in_bulk([pk for _, pk in distances])
+    return [(objects[pk], distance) for distance, pk in distances if pk in objects]
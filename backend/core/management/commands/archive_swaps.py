@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.archive import DEFAULT_BATCH_SIZE, archivable_swaps, archive_swaps
+from core.models import Swap
+
+
+class Command(BaseCommand):
+    help = "Moves swaps approved, rejected or completed more than --days ago into SwapArchive, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Archive swaps resolved more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches (for off-peak windows).")
+        parser.add_argument(
+            '--status', action='append', choices=Swap.TERMINAL_STATUSES,
+            help="Only archive swaps in this state (repeatable). Defaults to all finished states.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        statuses = tuple(options['status'] or Swap.TERMINAL_STATUSES)
+
+        if options['dry_run']:
+            count = archivable_swaps(cutoff, statuses).count()
+            self.stdout.write(f"{count} swaps resolved before {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        total = 0
+        for moved in archive_swaps(cutoff, options['batch_size'], statuses, options['max_batches']):
+            total += moved
+            self.stdout.write(f"Archived {moved} swaps ({total} so far).")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} swaps resolved before {cutoff:%Y-%m-%d}."))
@@ -0,0 +1,87 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from benchmarks import datagen, geo, load, render, report, serializers
+
+SECTIONS = ('serializers', 'load', 'render', 'nearby')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks serializers and every API route against a throwaway database "
+        "filled with synthetic data, and writes a JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=datagen.SCALES, default='small')
+        parser.add_argument('--users', type=int, help="Overrides the user count of --scale.")
+        parser.add_argument('--items', type=int, help="Overrides the item count of --scale.")
+        parser.add_argument('--swaps', type=int, help="Overrides the swap count of --scale.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--only', choices=SECTIONS, action='append', help="Run only this section (repeatable).")
+        parser.add_argument('--iterations', type=int, default=100, help="Requests per route.")
+        parser.add_argument('--serializer-iterations', type=int, default=200)
+        parser.add_argument('--list-size', type=int, default=100, help="Objects per many=True serializer case.")
+        parser.add_argument('--output', '-o', help="Write the JSON report here.")
+        parser.add_argument('--baseline', help="Compare against this earlier report.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed latency growth before it counts as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        sizes = dict(datagen.SCALES[options['scale']])
+        for key in ('users', 'items', 'swaps'):
+            if options[key] is not None:
+                sizes[key] = options[key]
+        sections = options['only'] or SECTIONS
+        baseline = report.load(options['baseline']) if options['baseline'] else None
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # The load driver calls each route far more often than the production rates allow
+        throttling_off = override_settings(THROTTLE_RATES={})
+        throttling_off.enable()
+        try:
+            self.stdout.write(f"Generating {sizes['users']} users, {sizes['items']} items, {sizes['swaps']} swaps...")
+            fixtures = datagen.generate(seed=options['seed'], **sizes)
+
+            results = {}
+            if 'serializers' in sections:
+                self.stdout.write("Running serializer benchmarks...")
+                results['serializers'] = serializers.run(
+                    fixtures, iterations=options['serializer_iterations'], list_size=options['list_size'],
+                )
+            if 'load' in sections:
+                self.stdout.write("Running route load tests...")
+                results['load'] = load.run(fixtures, iterations=options['iterations'])
+            if 'render' in sections:
+                self.stdout.write("Measuring payload sizes and render times...")
+                results['render'] = render.run(fixtures, iterations=options['serializer_iterations'])
+            if 'nearby' in sections:
+                self.stdout.write("Running proximity search benchmarks...")
+                results['nearby'] = geo.run(fixtures, iterations=options['iterations'], seed=options['seed'])
+        finally:
+            throttling_off.disable()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        result = report.build(results, scale=sizes, seed=options['seed'])
+        if options['output']:
+            report.write(result, options['output'])
+            self.stdout.write(f"Report written to {options['output']}.")
+        else:
+            self.stdout.write(json.dumps(result, indent=2, sort_keys=True))
+
+        if baseline is None:
+            return
+        rows = report.compare(result, baseline, threshold=options['threshold'])
+        self.stdout.write(report.format_comparison(rows))
+        regressions = [row for row in rows if row[-1]]
+        if regressions:
+            self.stderr.write(f"{len(regressions)} metrics regressed against {options['baseline']}.")
+            if options['fail_on_regression']:
+                raise CommandError("Benchmark regressions found.")
+        else:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
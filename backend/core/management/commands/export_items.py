@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.bulk import FORMATS, export_lines, guess_format
+from core.models import Item
+
+
+class Command(BaseCommand):
+    help = "Streams items to an NDJSON or CSV file (or stdout) in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help="File to write. Defaults to stdout.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the output file extension, or ndjson.")
+        parser.add_argument('--uploader', help="Only export items uploaded by this email.")
+        parser.add_argument('--moderation-status', choices=[choice for choice, _ in Item.MODERATION_STATUS_CHOICES])
+
+    def handle(self, *args, **options):
+        queryset = Item.objects.all()
+        if options['uploader']:
+            queryset = queryset.filter(uploader__email=options['uploader'])
+        if options['moderation_status']:
+            queryset = queryset.filter(moderation_status=options['moderation_status'])
+
+        fmt = options['format'] or guess_format(options['output'])
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for line in export_lines(queryset, fmt):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
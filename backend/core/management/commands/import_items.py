@@ -0,0 +1,66 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk import (
+    FORMATS, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS,
+    ImageResolver, guess_format, import_items, load_image_manifest, read_rows,
+)
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Imports items from an NDJSON or CSV file in batches. Can be resumed with --checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--uploader', help="Email of the uploader for rows without an uploader_email.")
+        parser.add_argument('--image-dir', help="Directory that image refs are relative to.")
+        parser.add_argument('--image-manifest', help="CSV (ref,url) or JSON file mapping image refs to URLs or paths.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Threads used to fetch images.")
+        parser.add_argument('--checkpoint', help="File recording the last committed row; the import resumes after it.")
+        parser.add_argument('--start', type=int, default=0, help="Skip rows up to and including this row number.")
+
+    def handle(self, *args, **options):
+        default_uploader = None
+        if options['uploader']:
+            try:
+                default_uploader = User.objects.get(email=options['uploader'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {options['uploader']}.")
+
+        start = options['start']
+        checkpoint = options['checkpoint']
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                start = max(start, int(f.read().strip() or 0))
+            self.stdout.write(f"Resuming after row {start}.")
+
+        def save_checkpoint(last_row, created):
+            if checkpoint:
+                with open(checkpoint, 'w') as f:
+                    f.write(str(last_row))
+
+        manifest = load_image_manifest(options['image_manifest']) if options['image_manifest'] else None
+        fmt = options['format'] or guess_format(options['path'])
+
+        with open(options['path'], newline='', encoding='utf-8') as stream:
+            report = import_items(
+                read_rows(stream, fmt),
+                default_uploader=default_uploader,
+                image_resolver=ImageResolver(options['image_dir'], manifest, fetch_urls=True),
+                start=start,
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                on_batch=save_checkpoint,
+            )
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        summary = f"Created {report['created']} items, {len(report['errors'])} rows failed, last row {report['last_row']}."
+        if 'error' in report:
+            raise CommandError(f"{report['error']}. {summary}")
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,105 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# One line of `python -X importtime` output: self and cumulative time in microseconds
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+TARGETS = {
+    # Everything a WSGI worker imports before it can serve its first request
+    'wsgi': ['-c', 'import rewear.wsgi'],
+    # A cheap management command, to see what every manage.py invocation pays
+    'manage': ['manage.py', 'check'],
+}
+
+
+def parse_importtime(stderr):
+    """Returns {module: (self_us, cumulative_us, depth)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules[module] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures cold-start import cost of the WSGI entry point and manage.py in fresh "
+        "interpreters (python -X importtime) and reports the most expensive modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f"Any of {', '.join(TARGETS)}. Defaults to all.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per target; the median is reported.")
+        parser.add_argument('--top', type=int, default=25, help="Modules to show per target.")
+        parser.add_argument('--sort', choices=('self', 'cumulative'), default='cumulative')
+        parser.add_argument('--packages', action='store_true', help="Group modules by top-level package.")
+        parser.add_argument('--json', action='store_true', help="Print the full report as JSON.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown target(s): {', '.join(sorted(unknown))}. Choose from {', '.join(TARGETS)}.")
+
+        report = {}
+        for target in options['targets'] or TARGETS:
+            report[target] = self.profile(target, options['repeat'], options['packages'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        key = 'self_ms' if options['sort'] == 'self' else 'cumulative_ms'
+        for target, result in report.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{target}: {result['wall_ms']:.0f} ms wall, {result['import_ms']:.0f} ms importing "
+                f"{result['module_count']} modules"
+            ))
+            rows = sorted(result['modules'].items(), key=lambda row: row[1][key], reverse=True)
+            self.stdout.write(f"{'self ms':>9} {'cumul. ms':>10}  module")
+            for module, stats in rows[:options['top']]:
+                self.stdout.write(f"{stats['self_ms']:>9.1f} {stats['cumulative_ms']:>10.1f}  {module}")
+
+    def profile(self, target, repeat, by_package):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'rewear.settings'))
+        runs, wall_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, '-X', 'importtime', *TARGETS[target]],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall_times.append((time.perf_counter() - start) * 1000)
+            if completed.returncode != 0:
+                raise CommandError(f"{target} failed to start:\n{completed.stderr[-2000:]}")
+            runs.append(parse_importtime(completed.stderr))
+
+        modules = {}
+        for module in runs[0]:
+            samples = [run[module] for run in runs if module in run]
+            name = module.split('.')[0] if by_package else module
+            self_ms = statistics.median(sample[0] for sample in samples) / 1000
+            cumulative_ms = statistics.median(sample[1] for sample in samples) / 1000
+            entry = modules.setdefault(name, {'self_ms': 0.0, 'cumulative_ms': 0.0})
+            entry['self_ms'] += self_ms
+            if by_package:
+                # A package's cost is the sum of its modules' own time
+                entry['cumulative_ms'] = entry['self_ms']
+            else:
+                entry['cumulative_ms'] = cumulative_ms
+
+        return {
+            'wall_ms': statistics.median(wall_times),
+            'import_ms': sum(entry['self_ms'] for entry in modules.values()),
+            'module_count': len(runs[0]),
+            'modules': modules,
+        }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the community stats and points leaderboard from the Swap, SwapArchive and User tables."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            days = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt community stats for {days} days."))
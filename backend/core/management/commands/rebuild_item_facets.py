@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import facets
+
+
+class Command(BaseCommand):
+    help = "Recomputes the catalog facet counts (ItemFacetCount) from the Item table."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet counts."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import projections
+
+
+class Command(BaseCommand):
+    help = "Empties read models built from the domain event log and replays the whole log into them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*', metavar='projection',
+            help=f"Projections to rebuild ({', '.join(projections.PROJECTORS)}). Defaults to all.",
+        )
+        parser.add_argument('--batch-size', type=int, default=projections.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(projections.PROJECTORS)
+        unknown = [name for name in names if name not in projections.PROJECTORS]
+        if unknown:
+            raise CommandError(f"Unknown projection(s): {', '.join(unknown)}.")
+
+        for name in names:
+            applied = projections.rebuild(projections.PROJECTORS[name], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {name} from {applied} events."))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import projections
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies domain events recorded since each projection's checkpoint. "
+        "With --follow, keeps polling for new events."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follow', action='store_true', help="Keep running and poll for new events.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --follow.")
+        parser.add_argument('--batch-size', type=int, default=projections.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            for name, applied in projections.catch_up(options['batch_size']).items():
+                if applied or not options['follow']:
+                    self.stdout.write(f"{name}: applied {applied} events.")
+            if not options['follow']:
+                return
+            time.sleep(options['interval'])
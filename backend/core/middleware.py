@@ -0,0 +1,139 @@
+import math
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError: # optional, responses fall back to gzip
+    brotli = None
+
+from .throttling import client_ip
+
+re_accepts_br = _lazy_re_compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses responses with brotli when the client accepts it and the
+    brotli package is installed, otherwise with Django's gzip handling
+    (including streaming responses such as the item export).
+
+    Responses smaller than COMPRESSION_MIN_SIZE bytes are sent as they are,
+    since for those the CPU time outweighs the bytes saved.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        accepts_br = re_accepts_br.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or response.streaming or not accepts_br:
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(response.content))
+        # Same as GZipMiddleware: the encoded bytes differ, so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Admission control: caps how many requests under ADMISSION_CONTROL_PATHS
+    this process works on at once, so a burst queues briefly or is turned away
+    instead of piling onto the database.
+
+    - A client with ADMISSION_MAX_PER_CLIENT requests already in flight gets a
+      429 straight away. Clients are told apart by IP like in the throttles,
+      so REST_FRAMEWORK['NUM_PROXIES'] applies here too.
+    - Otherwise the request waits up to ADMISSION_QUEUE_TIMEOUT seconds for one
+      of ADMISSION_MAX_CONCURRENT slots, and gets a 503 if none frees up.
+
+    Both responses carry Retry-After. Keep ADMISSION_MAX_CONCURRENT at or below
+    the database connections a process may use; with one thread per process
+    it has nothing to limit. Placed before the session and auth middleware so
+    shed requests cost no queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(getattr(settings, 'ADMISSION_CONTROL_PATHS', ('/api/',)))
+        self.max_concurrent = getattr(settings, 'ADMISSION_MAX_CONCURRENT', 32)
+        self.max_per_client = getattr(settings, 'ADMISSION_MAX_PER_CLIENT', 8)
+        self.queue_timeout = getattr(settings, 'ADMISSION_QUEUE_TIMEOUT', 2.0)
+        self.retry_after = getattr(settings, 'ADMISSION_RETRY_AFTER', 1)
+        self.slots = threading.BoundedSemaphore(self.max_concurrent)
+        self.lock = threading.Lock()
+        self.in_flight = Counter() # client -> requests being worked on
+
+    def refuse(self, status, message):
+        response = JsonResponse({'error': message}, status=status)
+        response['Retry-After'] = str(math.ceil(self.retry_after))
+        return response
+
+    def __call__(self, request):
+        if not request.path.startswith(self.paths):
+            return self.get_response(request)
+
+        client = client_ip(request)
+        with self.lock:
+            if self.in_flight[client] >= self.max_per_client:
+                return self.refuse(429, 'Too many concurrent requests from this client.')
+            self.in_flight[client] += 1
+
+        release = _Release(self, client)
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            release(slot=False)
+            return self.refuse(503, 'The server is busy. Try again shortly.')
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release()
+            raise
+        if response.streaming:
+            # A streamed body (e.g. the item export) still reads the database while it
+            # is sent, so keep the slot until the server closes the response.
+            response._resource_closers.append(release)
+        else:
+            release()
+        return response
+
+
+class _Release:
+    """Gives back a request's slot and client count, once."""
+
+    def __init__(self, limiter, client):
+        self.limiter = limiter
+        self.client = client
+        self.done = False
+
+    def __call__(self, slot=True):
+        if self.done:
+            return
+        self.done = True
+        if slot:
+            self.limiter.slots.release()
+        with self.limiter.lock:
+            self.limiter.in_flight[self.client] -= 1
+            if not self.limiter.in_flight[self.client]:
+                del self.limiter.in_flight[self.client]
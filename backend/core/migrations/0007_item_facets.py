@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:40
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# A copy of core.facets as of this migration, so later changes there don't change what it does
+POINT_BUCKETS = [
+    ('0-49', 0, 49),
+    ('50-99', 50, 99),
+    ('100-199', 100, 199),
+    ('200+', 200, None),
+]
+
+
+def facet_keys(point_value, uploader_id, created_at):
+    keys = [
+        ('all', ''),
+        ('redeemable', 'false' if point_value is None else 'true'),
+        ('uploader', str(uploader_id)),
+        ('created', timezone.localdate(created_at).isoformat()),
+    ]
+    if point_value is not None:
+        for label, low, high in POINT_BUCKETS:
+            if point_value >= low and (high is None or point_value <= high):
+                keys.append(('points', label))
+                break
+    return keys
+
+
+def populate_facet_counts(apps, schema_editor):
+    Item = apps.get_model('core', 'Item')
+    ItemFacetCount = apps.get_model('core', 'ItemFacetCount')
+    counts = Counter()
+    rows = Item.objects.filter(available=True, moderation_status='approved').values_list('point_value', 'uploader_id', 'created_at')
+    for row in rows.iterator(chunk_size=2000):
+        counts.update(facet_keys(*row))
+    ItemFacetCount.objects.bulk_create(
+        [ItemFacetCount(facet=facet, value=value, count=count) for (facet, value), count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_item_moderation_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(blank=True, max_length=64)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['moderation_status', 'available', 'point_value'], name='item_catalog_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['moderation_status', 'available', 'created_at'], name='item_catalog_recent_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemfacetcount',
+            unique_together={('facet', 'value')},
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_item_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='swap',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_version_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('swap_id', models.BigIntegerField(unique=True)),
+                ('item_id', models.BigIntegerField()),
+                ('item_title', models.CharField(max_length=200)),
+                ('requested_item_id', models.BigIntegerField(blank=True, null=True)),
+                ('requested_item_title', models.CharField(blank=True, max_length=200)),
+                ('point_value', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('completed', 'Completed')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('item_uploader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_item_swaps', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_swaps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='swaparchive_user_idx'), models.Index(fields=['item_uploader', '-created_at'], name='swaparchive_uploader_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_domain_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('swaps_requested', models.IntegerField(default=0)),
+                ('swaps_approved', models.IntegerField(default=0)),
+                ('swaps_rejected', models.IntegerField(default=0)),
+                ('items_rehomed', models.IntegerField(default=0)),
+                ('points_redeemed', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('points', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['-points', 'user_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-points', 'id'], name='user_points_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_community_stats'),
+    ]
+
+    operations = [
+        # The user_id column stays as it is, without its foreign key constraint, so
+        # the feed doesn't need rebuilding. Only the model state renames the field.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='activityentry',
+                    name='user',
+                    field=models.BigIntegerField(db_column='user_id'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name='activityentry',
+                    unique_together=set(),
+                ),
+                migrations.RemoveField(
+                    model_name='activityentry',
+                    name='user',
+                ),
+                migrations.AddField(
+                    model_name='activityentry',
+                    name='user_id',
+                    field=models.BigIntegerField(default=0),
+                    preserve_default=False,
+                ),
+                migrations.AlterUniqueTogether(
+                    name='activityentry',
+                    unique_together={('user_id', 'event_id')},
+                ),
+            ],
+        ),
+    ]
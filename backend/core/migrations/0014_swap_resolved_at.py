@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+TERMINAL_STATUSES = ('approved', 'rejected', 'completed')
+
+
+def backfill_resolved_at(apps, schema_editor):
+    # When older swaps were resolved wasn't recorded; the day they were
+    # requested is the closest thing we have, and keeps them archivable.
+    for name in ('Swap', 'SwapArchive'):
+        model = apps.get_model('core', name)
+        model.objects.filter(status__in=TERMINAL_STATUSES, resolved_at__isnull=True).update(resolved_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_activityentry_plain_user_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='swap',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='swaparchive',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_resolved_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='swap',
+            index=models.Index(fields=['status', 'resolved_at'], name='swap_resolved_idx'),
+        ),
+    ]
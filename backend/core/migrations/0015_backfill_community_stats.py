@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:38
+
+import heapq
+from collections import Counter, defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+
+# A copy of core.stats as of this migration, so later changes there don't change what it does
+LEADERBOARD_SIZE = 10
+POINTS_IN_CIRCULATION = 'points_in_circulation'
+
+
+def swap_counts(created_at, resolved_at, status, requested_item_id, point_value):
+    counts = {(timezone.localdate(created_at), 'swaps_requested'): 1}
+    day = timezone.localdate(resolved_at or created_at)
+    if status in ('approved', 'completed'):
+        counts[(day, 'swaps_approved')] = 1
+        counts[(day, 'items_rehomed')] = 2 if requested_item_id else 1
+        if not requested_item_id and point_value:
+            counts[(day, 'points_redeemed')] = point_value
+    elif status == 'rejected':
+        counts[(day, 'swaps_rejected')] = 1
+    return counts
+
+
+def populate_community_stats(apps, schema_editor):
+    # 0012 created the tables empty; count everything that happened before it
+    User = apps.get_model('core', 'User')
+    Swap = apps.get_model('core', 'Swap')
+    SwapArchive = apps.get_model('core', 'SwapArchive')
+    DailyStat = apps.get_model('core', 'DailyStat')
+    CommunityTotal = apps.get_model('core', 'CommunityTotal')
+    LeaderboardEntry = apps.get_model('core', 'LeaderboardEntry')
+
+    counts = Counter()
+    sources = (
+        (Swap, ('created_at', 'resolved_at', 'status', 'requested_item_id', 'item__point_value')),
+        (SwapArchive, ('created_at', 'resolved_at', 'status', 'requested_item_id', 'point_value')),
+    )
+    for model, fields in sources:
+        for row in model.objects.order_by().values_list(*fields).iterator(chunk_size=2000):
+            counts.update(swap_counts(*row))
+    by_day = defaultdict(dict)
+    for (day, counter), amount in counts.items():
+        by_day[day][counter] = amount
+    DailyStat.objects.all().delete()
+    DailyStat.objects.bulk_create([DailyStat(date=day, **amounts) for day, amounts in by_day.items()], batch_size=1000)
+
+    users = User.objects.order_by().values_list('id', 'points')
+    total = 0
+    top = []
+    for user_id, points in users.iterator(chunk_size=2000):
+        total += points
+        entry = ((points, -user_id), user_id, points)
+        if len(top) < LEADERBOARD_SIZE:
+            heapq.heappush(top, entry)
+        elif entry > top[0]:
+            heapq.heapreplace(top, entry)
+    CommunityTotal.objects.update_or_create(name=POINTS_IN_CIRCULATION, defaults={'value': total})
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create([LeaderboardEntry(user_id=user_id, points=points) for _, user_id, points in top])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_swap_resolved_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_community_stats, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,31 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from . import geo
+
+def bump_version(instance, save_kwargs):
+    if instance._state.adding:
+        return
+    instance.version += 1
+    if save_kwargs.get('update_fields') is not None:
+        save_kwargs['update_fields'] = set(save_kwargs['update_fields']) | {'version'}
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     points = models.IntegerField(default=50)
+    # Optional coarse home location (see core.geo), used as the default location of new items
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Lets core.stats refill the points leaderboard without scanning every user
+            models.Index(fields=['-points', 'id'], name='user_points_idx'),
+        ]
+
 class Item(models.Model):
     MODERATION_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -32,13 +50,36 @@ class Item(models.Model):
         choices=MODERATION_STATUS_CHOICES, 
         default='pending'
     ) # New field
+    version = models.PositiveIntegerField(default=1) # Bumped on every write, see core.concurrency
+    # Optional coarse location; geohash is derived from it on save for proximity search (core.geo).
+    # geohash is indexed on its own: nearby searches are a few ranges on it, whatever else they filter on.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Covers the public catalog filters: visibility plus point range / redeemability
+            models.Index(fields=['moderation_status', 'available', 'point_value'], name='item_catalog_points_idx'),
+            models.Index(fields=['moderation_status', 'available', 'created_at'], name='item_catalog_recent_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Writes that bypass core.concurrency.versioned_update (e.g. the admin) still move
+        # the version on, so clients holding an older ETag notice the change.
+        bump_version(self, kwargs)
+        self.sync_geohash()
+        if kwargs.get('update_fields') is not None and {'latitude', 'longitude'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'geohash'}
+        super().save(*args, **kwargs)
+
+    def sync_geohash(self):
+        self.geohash = geo.encode(self.latitude, self.longitude)
+
 class Swap(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -46,20 +87,164 @@ class Swap(models.Model):
         ('rejected', 'Rejected'),
         ('completed', 'Completed'),
     ]
+    # Swaps in these states never change again and can be moved to SwapArchive
+    TERMINAL_STATUSES = ('approved', 'rejected', 'completed')
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='swaps') # The user initiating the swap/redeem
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='swap_requests') # The item being requested
     requested_item = models.ForeignKey(Item, on_delete=models.SET_NULL, related_name='offered_in_swaps', null=True, blank=True) # The item offered by 'user' for a swap
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True) # When it left 'pending', set by core.services
+    version = models.PositiveIntegerField(default=1) # Bumped on every write, see core.concurrency
     
     class Meta:
         ordering = ['-created_at']
         # Ensure unique combination for a user requesting an item, either via points (requested_item=None)
         # or by offering a specific item.
         unique_together = ['user', 'item', 'requested_item'] 
+        indexes = [
+            models.Index(fields=['status', 'resolved_at'], name='swap_resolved_idx'), # For core.archive
+        ]
     
     def __str__(self):
         if self.requested_item:
             return f"{self.user.email} offers {self.requested_item.title} for {self.item.title} ({self.status})"
         return f"{self.user.email} redeems {self.item.title} ({self.status})"
+
+    def save(self, *args, **kwargs):
+        bump_version(self, kwargs)
+        super().save(*args, **kwargs)
+
+class ItemFacetCount(models.Model):
+    # Precomputed number of public catalog items per facet value, kept up to date by core.facets
+    facet = models.CharField(max_length=20) # 'all', 'redeemable', 'points', 'uploader' or 'created'
+    value = models.CharField(max_length=64, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['facet', 'value']
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+class SwapArchive(models.Model):
+    # Compact copy of a finished Swap, moved out of the hot table by the archive_swaps command.
+    # Item details are copied because the items may be deleted after the swap was archived.
+    swap_id = models.BigIntegerField(unique=True) # id the swap had in the Swap table
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_swaps') # The user who made the request
+    item_uploader = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_item_swaps') # Owner of the requested item
+    item_id = models.BigIntegerField()
+    item_title = models.CharField(max_length=200)
+    requested_item_id = models.BigIntegerField(null=True, blank=True) # The item offered, if any
+    requested_item_title = models.CharField(max_length=200, blank=True)
+    point_value = models.IntegerField(null=True, blank=True) # Item's point value at archive time
+    status = models.CharField(max_length=20, choices=Swap.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='swaparchive_user_idx'),
+            models.Index(fields=['item_uploader', '-created_at'], name='swaparchive_uploader_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived swap {self.swap_id}: {self.item_title} ({self.status})"
+
+class DomainEvent(models.Model):
+    # Append-only record of a state change, written in the same transaction as the change
+    # (see core.events). Ids are plain columns so events outlive the rows they mention.
+    type = models.CharField(max_length=40) # e.g. 'swap.approved', see core.events
+    actor_id = models.BigIntegerField(null=True, blank=True) # User who caused it, if any
+    swap_id = models.BigIntegerField(null=True, blank=True)
+    item_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict) # Everything else the projectors need, as of the event
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.type}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Domain events are append-only and can't be changed.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Domain events are append-only and can't be deleted.")
+
+class ProjectionCheckpoint(models.Model):
+    # How far a projector (core.projections) has read the DomainEvent log
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0) # id of the last event applied
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at event {self.position}"
+
+class ActivityEntry(models.Model):
+    # Read model: one row per event in a user's activity feed, built from DomainEvent.
+    # user_id is a plain column, like ItemHistoryEntry.item_id, so replaying events of
+    # deleted users can't fail; the unique index below also serves feed lookups.
+    user_id = models.BigIntegerField()
+    event_id = models.BigIntegerField()
+    type = models.CharField(max_length=40)
+    role = models.CharField(max_length=20) # how the user took part: 'requester', 'owner', 'uploader' or 'account'
+    swap_id = models.BigIntegerField(null=True, blank=True)
+    item_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-event_id']
+        unique_together = ['user_id', 'event_id']
+
+class ItemHistoryEntry(models.Model):
+    # Read model: the swap and moderation events of one item, built from DomainEvent
+    item_id = models.BigIntegerField()
+    event_id = models.BigIntegerField()
+    type = models.CharField(max_length=40)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    swap_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-event_id']
+        unique_together = ['item_id', 'event_id']
+
+class DailyStat(models.Model):
+    # Community counters for swaps requested on one day, kept up to date by core.stats
+    date = models.DateField(unique=True)
+    swaps_requested = models.IntegerField(default=0)
+    swaps_approved = models.IntegerField(default=0)
+    swaps_rejected = models.IntegerField(default=0)
+    items_rehomed = models.IntegerField(default=0) # Items that changed hands in approved swaps
+    points_redeemed = models.BigIntegerField(default=0) # Points spent on approved redemptions
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Stats for {self.date}"
+
+class CommunityTotal(models.Model):
+    # A running platform-wide total kept up to date by core.stats, e.g. 'points_in_circulation'
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class LeaderboardEntry(models.Model):
+    # One of the users with the most points (core.stats.LEADERBOARD_SIZE of them)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    points = models.IntegerField()
+
+    class Meta:
+        ordering = ['-points', 'user_id']
@@ -0,0 +1,153 @@
+"""
+Projectors build read models from the DomainEvent log (see core.events).
+
+Each projector keeps a ProjectionCheckpoint with the id of the last event it
+applied. `run` reads the events after the checkpoint in batches and applies
+each batch and the new checkpoint in one transaction, so a crash never loses
+or repeats an event. `rebuild` empties a projector's tables and replays the
+whole log, which is also how a new projector is back-filled.
+
+Event ids normally follow commit order. Where they don't (two transactions
+committing out of order, or a rolled back insert leaving a hole), `run`
+stops in front of a missing id until GAP_TIMEOUT has passed, so an event that
+commits late isn't skipped.
+"""
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import events
+from .models import User, DomainEvent, ProjectionCheckpoint, ActivityEntry, ItemHistoryEntry
+
+DEFAULT_BATCH_SIZE = 1000
+GAP_TIMEOUT = datetime.timedelta(seconds=10)
+
+
+class Projector:
+    name = None
+    models = () # read model tables, emptied by reset()
+
+    def apply(self, batch):
+        """Updates the read model for a batch of events, in id order."""
+        raise NotImplementedError
+
+    def reset(self):
+        for model in self.models:
+            model.objects.all().delete()
+
+
+class ActivityFeedProjector(Projector):
+    """What happened to each user: their swaps, swaps for their items, moderation and points."""
+    name = 'activity_feed'
+    models = (ActivityEntry,)
+
+    def entries_for(self, event):
+        data = event.data
+        if event.type in events.SWAP_EVENTS:
+            yield data['requester_id'], 'requester'
+            yield data['owner_id'], 'owner'
+        elif event.type in events.ITEM_EVENTS:
+            yield data['uploader_id'], 'uploader'
+        elif event.type == events.POINTS_CHANGED:
+            yield data['user_id'], 'account'
+
+    def apply(self, batch):
+        entries = [(event, user_id, role) for event in batch for user_id, role in self.entries_for(event)]
+        # Nobody can read the feed of a deleted user, so don't build one
+        existing = set(User.objects.filter(pk__in={user_id for _, user_id, _ in entries}).values_list('id', flat=True))
+        ActivityEntry.objects.bulk_create(
+            [
+                ActivityEntry(
+                    user_id=user_id, event_id=event.id, type=event.type, role=role,
+                    swap_id=event.swap_id, item_id=event.item_id, data=event.data, created_at=event.created_at,
+                )
+                for event, user_id, role in entries
+                if user_id in existing
+            ],
+            ignore_conflicts=True, # a user who is both requester and owner gets one entry
+        )
+
+
+class ItemHistoryProjector(Projector):
+    """Every swap and moderation event of an item, for either side of a swap."""
+    name = 'item_history'
+    models = (ItemHistoryEntry,)
+
+    def item_ids_for(self, event):
+        if event.type in events.SWAP_EVENTS:
+            yield event.item_id
+            if event.data.get('requested_item_id'):
+                yield event.data['requested_item_id']
+        elif event.type in events.ITEM_EVENTS:
+            yield event.item_id
+
+    def apply(self, batch):
+        ItemHistoryEntry.objects.bulk_create([
+            ItemHistoryEntry(
+                item_id=item_id, event_id=event.id, type=event.type, actor_id=event.actor_id,
+                swap_id=event.swap_id, data=event.data, created_at=event.created_at,
+            )
+            for event in batch
+            for item_id in self.item_ids_for(event)
+        ])
+
+
+PROJECTORS = {projector.name: projector for projector in (ActivityFeedProjector(), ItemHistoryProjector())}
+
+
+def _ready_events(rows, position, now):
+    """The leading run of `rows` that can be applied without skipping an id that may still commit."""
+    ready = []
+    expected = position + 1
+    for event in rows:
+        if event.id != expected and now - event.created_at < GAP_TIMEOUT:
+            break
+        ready.append(event)
+        expected = event.id + 1
+    return ready
+
+
+def run_batch(projector, batch_size=DEFAULT_BATCH_SIZE):
+    """Applies the next batch of events to `projector`. Returns how many were applied."""
+    with transaction.atomic():
+        # Writing the checkpoint first takes its row lock (the database lock on SQLite)
+        # before anything is read, so concurrent runners queue up instead of both
+        # applying the same events.
+        if not ProjectionCheckpoint.objects.filter(name=projector.name).update(updated_at=timezone.now()):
+            ProjectionCheckpoint.objects.get_or_create(name=projector.name) # first run
+        position = ProjectionCheckpoint.objects.get(name=projector.name).position
+
+        rows = list(DomainEvent.objects.filter(id__gt=position).order_by('id')[:batch_size])
+        ready = _ready_events(rows, position, timezone.now())
+        if not ready:
+            return 0
+        projector.apply(ready)
+        ProjectionCheckpoint.objects.filter(name=projector.name).update(position=ready[-1].id)
+    return len(ready)
+
+
+def run(projector, batch_size=DEFAULT_BATCH_SIZE):
+    """Brings `projector` up to date with the log. Returns how many events were applied."""
+    total = 0
+    while True:
+        applied = run_batch(projector, batch_size)
+        total += applied
+        if applied < batch_size:
+            return total
+
+
+def catch_up(batch_size=DEFAULT_BATCH_SIZE):
+    """Brings every projector up to date; called after each transaction that records events."""
+    return {name: run(projector, batch_size) for name, projector in PROJECTORS.items()}
+
+
+def rebuild(projector, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Empties `projector`'s read model and replays the whole log into it.
+    The read model is incomplete until this returns.
+    """
+    with transaction.atomic():
+        projector.reset()
+        ProjectionCheckpoint.objects.update_or_create(name=projector.name, defaults={'position': 0})
+    return run(projector, batch_size)
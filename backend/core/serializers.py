@@ -1,12 +1,93 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth import authenticate
-from .models import User, Item, Swap
+from . import geo
+from .models import User, Item, Swap, SwapArchive, ActivityEntry, ItemHistoryEntry
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_field_paths(value):
+    """Turns 'id,item.title,item.uploader' into {'id': {}, 'item': {'title': {}, 'uploader': {}}}."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+class SparseFieldsMixin:
+    """
+    Lets GET requests trim the response with `?fields=` and `?expand=`.
+
+    `fields` lists the fields to keep (dotted paths reach into nested objects).
+    Once either parameter is given, the relations in `expandable_fields` are
+    rendered as their id unless named in `expand`, e.g.
+    `/api/items/?fields=id,title,point_value` or `/api/swaps/?expand=item`.
+    Without either parameter the serializer renders exactly as before.
+    """
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self.get_sparse_spec()
+        if spec is None:
+            return fields
+
+        only, expand = spec
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        for name in self.expandable_fields:
+            if name not in fields:
+                continue
+            if name in expand:
+                # Hand the nested part of the spec down to the nested serializer
+                fields[name].sparse_spec = (only.get(name, {}), expand[name])
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        return fields
+
+    def get_sparse_spec(self):
+        if hasattr(self, 'sparse_spec'):
+            return self.sparse_spec
+        # Only the outermost serializer reads the query string
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        request = self.context.get('request')
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        return parse_field_paths(params.get('fields', '')), parse_field_paths(params.get('expand', ''))
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Has the mixin too, so `fields` paths like uploader.email reach into expanded users
     class Meta:
         model = User
         fields = ['id', 'email', 'username', 'points', 'is_staff'] # Added is_staff
 
+class LocationMixin:
+    """Validates an optional latitude/longitude pair and rounds it to a coarse location."""
+
+    def validate(self, data):
+        data = super().validate(data)
+        if 'latitude' in data or 'longitude' in data:
+            latitude = data.get('latitude', getattr(self.instance, 'latitude', None))
+            longitude = data.get('longitude', getattr(self.instance, 'longitude', None))
+            if (latitude is None) != (longitude is None):
+                raise serializers.ValidationError('Give both latitude and longitude, or neither.')
+            data['latitude'], data['longitude'] = geo.coarse(latitude), geo.coarse(longitude)
+        return data
+
+class ProfileSerializer(LocationMixin, UserSerializer):
+    # The signed in user's own profile; only the location can be changed here
+    latitude = serializers.FloatField(min_value=-90, max_value=90, allow_null=True, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, allow_null=True, required=False)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['latitude', 'longitude']
+        read_only_fields = ['id', 'email', 'username', 'points', 'is_staff']
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
@@ -44,22 +125,57 @@ class LoginSerializer(serializers.Serializer):
         
         return data
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, LocationMixin, serializers.ModelSerializer):
     uploader = UserSerializer(read_only=True)
+    latitude = serializers.FloatField(min_value=-90, max_value=90, allow_null=True, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, allow_null=True, required=False)
+    expandable_fields = ('uploader',)
     
     class Meta:
         model = Item
-        fields = ['id', 'title', 'description', 'image', 'featured', 'available', 'uploader', 'created_at', 'point_value', 'moderation_status'] # Added moderation_status
-        read_only_fields = ['uploader', 'created_at', 'moderation_status'] # moderation_status is read-only for regular users
+        fields = ['id', 'title', 'description', 'image', 'featured', 'available', 'uploader', 'created_at', 'point_value', 'moderation_status', 'version', 'latitude', 'longitude'] # Added moderation_status
+        read_only_fields = ['uploader', 'created_at', 'moderation_status', 'version'] # moderation_status is read-only for regular users
 
-class SwapSerializer(serializers.ModelSerializer):
+class SwapSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     item = ItemSerializer(read_only=True) # The item being requested
     requested_item = ItemSerializer(read_only=True) # The item being offered by the 'user'
+    expandable_fields = ('user', 'item', 'requested_item')
     
     class Meta:
         model = Swap
-        fields = ['id', 'user', 'item', 'requested_item', 'status', 'created_at']
-        read_only_fields = ['user', 'created_at']
+        fields = ['id', 'user', 'item', 'requested_item', 'status', 'created_at', 'resolved_at', 'version']
+        read_only_fields = ['user', 'created_at', 'resolved_at', 'version']
         # When creating, we'll pass item_id and requested_item_id directly to the view
         # so they are not part of the serializer's writable fields.
+
+class SwapArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SwapArchive
+        fields = [
+            'swap_id', 'user', 'item_uploader', 'item_id', 'item_title', 'requested_item_id',
+            'requested_item_title', 'point_value', 'status', 'created_at', 'resolved_at', 'archived_at',
+        ]
+        read_only_fields = fields
+
+class ActivityEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ActivityEntry
+        fields = ['event_id', 'type', 'role', 'swap_id', 'item_id', 'data', 'created_at']
+        read_only_fields = fields
+
+class ItemHistoryEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ItemHistoryEntry
+        fields = ['event_id', 'type', 'actor_id', 'swap_id', 'data', 'created_at']
+        read_only_fields = fields
+
+class ItemImportSerializer(LocationMixin, serializers.ModelSerializer):
+    # Used by bulk import to validate one row at a time. The uploader is given by email
+    # and the image as a file name, path or URL that core.bulk resolves.
+    uploader_email = serializers.EmailField(required=False)
+    image = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    class Meta:
+        model = Item
+        fields = ['title', 'description', 'point_value', 'featured', 'available', 'moderation_status', 'uploader_email', 'image', 'latitude', 'longitude']
@@ -0,0 +1,227 @@
+from collections import defaultdict
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import events, facets, stats
+from .concurrency import bulk_versioned_update, versioned_update
+from .models import User, Item, Swap
+
+# POINTS_FOR_GIVING_ITEM is for when an item is swapped (not redeemed via points)
+POINTS_FOR_GIVING_ITEM = 10
+
+MODERATION_EVENTS = {'approved': events.ITEM_APPROVED, 'rejected': events.ITEM_REJECTED}
+
+
+def resolve_competing_swaps(swap, gone_item_ids, actor=None):
+    """
+    Rejects every other pending swap that can no longer go through because
+    the items in `gone_item_ids` have just changed hands via `swap`.
+
+    A swap competes if it requests one of the gone items or offers one of them.
+    Point redemptions are refunded and offered items that are still with their
+    owner are listed again. Everything runs as a few bulk queries, so this must
+    be called inside the transaction that approves `swap`. If a competing swap
+    changes while this runs, VersionConflict is raised and the caller's
+    transaction should be rolled back. A rejection (and refund) event is
+    recorded for each of them, attributed to `actor`.
+
+    Returns the number of swaps that were rejected.
+    """
+    gone_item_ids = set(gone_item_ids)
+    competing = list(
+        Swap.objects
+        .filter(Q(item_id__in=gone_item_ids) | Q(requested_item_id__in=gone_item_ids), status='pending')
+        .exclude(pk=swap.pk)
+        .values_list(
+            'id', 'version', 'user_id', 'requested_item_id', 'item__point_value',
+            'item_id', 'item__title', 'item__uploader_id', 'requested_item__title', 'created_at',
+        )
+    )
+    if not competing:
+        return 0
+
+    versions = {} # swap id -> version it was read at
+    offered_item_ids = []
+    refunds = defaultdict(int) # user_id -> points to give back
+    rejection_events = []
+    rejected = [] # (created_at, requested_item_id, point_value) for the stats
+    for (swap_id, version, user_id, offered_item_id, point_value,
+         item_id, item_title, owner_id, offered_item_title, created_at) in competing:
+        versions[swap_id] = version
+        rejected.append((created_at, offered_item_id, point_value))
+        rejection_events.append(events.swap_event_from_values(
+            events.SWAP_REJECTED, actor, swap_id, item_id,
+            requester_id=user_id, owner_id=owner_id, item_title=item_title,
+            requested_item_id=offered_item_id, requested_item_title=offered_item_title,
+            point_value=point_value, reason='competing', resolved_by=swap.id,
+        ))
+        if offered_item_id:
+            if offered_item_id not in gone_item_ids:
+                offered_item_ids.append(offered_item_id)
+        elif point_value is not None:
+            refunds[user_id] += point_value
+            rejection_events.append(events.points_event(user_id, point_value, 'refund', swap_id, actor=actor))
+
+    # Refunds below are only right if none of these swaps was resolved meanwhile
+    resolved_at = swap.resolved_at or timezone.now()
+    bulk_versioned_update(Swap, versions, status='rejected', resolved_at=resolved_at)
+
+    if offered_item_ids:
+        with facets.track(offered_item_ids):
+            Item.objects.filter(pk__in=offered_item_ids).update(available=True, version=F('version') + 1)
+
+    # Most competing redemptions are for the same item, so group requesters by
+    # refund amount and issue one UPDATE per distinct amount.
+    users_by_amount = defaultdict(list)
+    for user_id, amount in refunds.items():
+        users_by_amount[amount].append(user_id)
+    for amount, user_ids in users_by_amount.items():
+        User.objects.filter(pk__in=user_ids).update(points=F('points') + amount)
+    events.record(*rejection_events)
+    stats.swaps_resolved(rejected, 'rejected', resolved_at)
+    stats.points_changed(refunds)
+
+    print(f"Resolved {len(versions)} competing swaps for swap {swap.id}: "
+          f"{len(offered_item_ids)} offered items re-listed, {len(refunds)} requesters refunded.")
+    return len(versions)
+
+
+def approve_swap(swap, actor=None, expected_version=None):
+    """
+    Approves a pending `swap`: the items change hands, the owner is paid and
+    every competing request is rejected. `swap` needs item__uploader and
+    requested_item loaded.
+
+    Must be called inside a transaction. Every write is conditional, so if the
+    swap (at `expected_version`, default swap.version) or one of its items
+    changed meanwhile, VersionConflict is raised and the transaction should be
+    rolled back.
+    """
+    uploader_user = swap.item.uploader # The owner of the item being requested
+    item_to_give = swap.item # The item being requested
+    gone_item_ids = [item_to_give.id] # Items that change hands with this swap
+
+    # Claim the swap first, so only one concurrent approve/disapprove gets past this point
+    swap.status = 'approved'
+    swap.resolved_at = timezone.now()
+    versioned_update(swap, ['status', 'resolved_at'], expected_version, status='pending')
+    approval_events = [events.swap_event(events.SWAP_APPROVED, swap, actor=actor)]
+
+    if swap.requested_item:
+        # This is an item-for-item swap
+        offered_item = swap.requested_item
+        gone_item_ids.append(offered_item.id)
+
+        # Ensure both items are set to unavailable
+        item_to_give.available = False
+        versioned_update(item_to_give, ['available'])
+        offered_item.available = False
+        versioned_update(offered_item, ['available'])
+
+        # Uploader gets POINTS_FOR_GIVING_ITEM for successfully swapping their item
+        User.objects.filter(pk=uploader_user.pk).update(points=F('points') + POINTS_FOR_GIVING_ITEM)
+        approval_events.append(events.points_event(uploader_user.pk, POINTS_FOR_GIVING_ITEM, 'swap_reward', swap.id, actor=actor))
+        stats.points_changed({uploader_user.pk: POINTS_FOR_GIVING_ITEM})
+        print(f"Uploader {uploader_user.email} points increased by {POINTS_FOR_GIVING_ITEM} for swap.")
+        print(f"Item-for-item swap {swap.id} approved. '{item_to_give.title}' and '{offered_item.title}' are now unavailable.")
+
+    else:
+        # This is a point redemption
+        # Uploader gets the item's point_value for giving it away via points
+        if item_to_give.point_value is not None:
+            User.objects.filter(pk=uploader_user.pk).update(points=F('points') + item_to_give.point_value)
+            approval_events.append(events.points_event(uploader_user.pk, item_to_give.point_value, 'redemption_payout', swap.id, actor=actor))
+            stats.points_changed({uploader_user.pk: item_to_give.point_value})
+            print(f"Uploader {uploader_user.email} points increased by {item_to_give.point_value} for redemption.")
+        else:
+            print(f"Warning: Item {item_to_give.title} redeemed via points but has no point_value set for uploader to gain.")
+
+        item_to_give.available = False
+        versioned_update(item_to_give, ['available'])
+        print(f"Point redemption {swap.id} approved. Item '{item_to_give.title}' is now unavailable.")
+
+    events.record(*approval_events)
+    stats.swaps_resolved([(swap.created_at, swap.requested_item_id, item_to_give.point_value)], 'approved', swap.resolved_at)
+
+    # Every other pending request for (or offer of) the items that just changed hands
+    # can no longer succeed, so reject them now instead of leaving them locked.
+    resolve_competing_swaps(swap, gone_item_ids, actor=actor)
+    uploader_user.refresh_from_db(fields=['points'])
+    return swap
+
+
+def reject_swap(swap, actor=None, expected_version=None):
+    """
+    Rejects a pending `swap`: an offered item is listed again and redeemed
+    points are refunded. `swap` needs item and requested_item loaded. Must be
+    called inside a transaction; raises VersionConflict like approve_swap.
+    """
+    # Claim the swap first, so a concurrent approval can't also go through
+    swap.status = 'rejected'
+    swap.resolved_at = timezone.now()
+    versioned_update(swap, ['status', 'resolved_at'], expected_version, status='pending')
+    events.record(events.swap_event(events.SWAP_REJECTED, swap, actor=actor, reason='declined'))
+    stats.swaps_resolved([(swap.created_at, swap.requested_item_id, swap.item.point_value)], 'rejected', swap.resolved_at)
+
+    # If an item was offered in the swap, make it available again
+    if swap.requested_item:
+        offered_item = swap.requested_item
+        offered_item.available = True
+        versioned_update(offered_item, ['available'])
+        print(f"Offered item '{offered_item.title}' made available again after swap disapproval.")
+
+    # If it was a point redemption, refund points to the requester
+    elif swap.item.point_value is not None:
+        User.objects.filter(pk=swap.user_id).update(points=F('points') + swap.item.point_value) # Refund points to requester
+        events.record(events.points_event(swap.user_id, swap.item.point_value, 'refund', swap.id, actor=actor))
+        stats.points_changed({swap.user_id: swap.item.point_value})
+        swap.user.refresh_from_db(fields=['points'])
+        print(f"Requester {swap.user.email} refunded {swap.item.point_value} points for disapproved redemption.")
+    return swap
+
+
+def moderate_item(item, moderation_status, actor=None, expected_version=None):
+    """
+    Sets an item's moderation status to 'approved' or 'rejected' (which also
+    takes it off the catalog) and records the event. Raises VersionConflict
+    if the item is no longer at `expected_version` (default item.version).
+    """
+    item.moderation_status = moderation_status
+    update_fields = ['moderation_status']
+    if moderation_status == 'rejected':
+        item.available = False # Rejected items should not be available
+        update_fields.append('available')
+    versioned_update(item, update_fields, expected_version)
+    events.record(events.item_event(MODERATION_EVENTS[moderation_status], item, actor=actor))
+    return item
+
+
+def moderate_items(queryset, moderation_status, actor=None):
+    """
+    moderate_item for every item in `queryset` that isn't already in that
+    state, in a few bulk queries. Must be called inside a transaction; raises
+    VersionConflict if any of the items changed while this ran.
+
+    Returns the number of items changed.
+    """
+    rows = list(
+        queryset.exclude(moderation_status=moderation_status).order_by()
+        .values_list('id', 'version', 'uploader_id', 'title')
+    )
+    if not rows:
+        return 0
+
+    values = {'moderation_status': moderation_status}
+    if moderation_status == 'rejected':
+        values['available'] = False
+    versions = {item_id: version for item_id, version, _, _ in rows}
+    # A bulk update skips the item signals, so keep the facet counts right here
+    with facets.track(versions):
+        bulk_versioned_update(Item, versions, **values)
+    events.record(*[
+        events.item_event_from_values(MODERATION_EVENTS[moderation_status], actor, item_id, uploader_id, title)
+        for item_id, _, uploader_id, title in rows
+    ])
+    print(f"{len(rows)} items {moderation_status} in bulk.")
+    return len(rows)
@@ -0,0 +1,86 @@
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import facets, stats
+from .models import User, Item, Swap, SwapArchive, ActivityEntry
+
+
+@receiver(pre_save, sender=Item)
+def remember_item_facets(sender, instance, raw=False, **kwargs):
+    # The row as it is before this save, so post_save can move its facet counts
+    if raw or instance.pk is None:
+        instance._facet_keys_before = []
+        return
+    instance._facet_keys_before = facets.current_keys([instance.pk])
+
+
+@receiver(post_save, sender=Item)
+def update_item_facets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    facets.apply(getattr(instance, '_facet_keys_before', []), facets.keys_for_item(instance))
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_facets(sender, instance, **kwargs):
+    facets.apply(facets.keys_for_item(instance), [])
+
+
+@receiver(pre_delete, sender=Item)
+def remember_item_swap_stats(sender, instance, origin=None, **kwargs):
+    # Swaps for the item are deleted with it; swaps offering it lose their requested_item
+    swaps = Swap.objects.filter(Q(item_id=instance.pk) | Q(requested_item_id=instance.pk))
+    stats.deletion_started(origin or instance, swaps, SwapArchive.objects.none())
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_swap_stats(sender, instance, origin=None, **kwargs):
+    stats.deletion_finished(origin or instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_points(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Sign ups, admin edits and other saves of the whole user can change points
+    # outside the swap services, which report their own changes to core.stats.
+    instance._points_before = None
+    if raw or instance.pk is None or (update_fields is not None and 'points' not in update_fields):
+        return
+    instance._points_before = User.objects.filter(pk=instance.pk).values_list('points', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def update_user_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = 0 if created else getattr(instance, '_points_before', None)
+    if before is not None and instance.points != before:
+        stats.points_changed({instance.pk: instance.points - before})
+
+
+@receiver(pre_delete, sender=User)
+def remember_deleted_user_points(sender, instance, **kwargs):
+    # The instance being deleted may hold an older balance than the row
+    instance._points_before = User.objects.filter(pk=instance.pk).values_list('points', flat=True).first()
+
+
+@receiver(pre_delete, sender=User)
+def remember_user_swap_stats(sender, instance, origin=None, **kwargs):
+    # Swaps on the user's items are covered by the items' own pre_delete
+    stats.deletion_started(
+        origin or instance,
+        Swap.objects.filter(user_id=instance.pk),
+        SwapArchive.objects.filter(Q(user_id=instance.pk) | Q(item_uploader_id=instance.pk)),
+    )
+
+
+@receiver(post_delete, sender=User)
+def remove_user_stats(sender, instance, origin=None, **kwargs):
+    stats.points_changed({instance.pk: -(getattr(instance, '_points_before', None) or 0)})
+    stats.deletion_finished(origin or instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_activity(sender, instance, **kwargs):
+    # ActivityEntry.user_id isn't a foreign key, so the feed isn't deleted along with the user
+    ActivityEntry.objects.filter(user_id=instance.pk).delete()
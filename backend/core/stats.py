@@ -0,0 +1,260 @@
+"""
+Community stats: per-day swap counters, points in circulation and the points
+leaderboard.
+
+Everything is kept up to date in the transaction of the write that changes
+it, like the facet counts in core.facets: the swap services and create_swap
+call `swap_requested`, `swaps_resolved` and `points_changed`, and the user
+signals in core.signals cover sign ups, admin edits and deletions. Reads never
+aggregate the base tables. `rebuild()` recomputes everything from them.
+
+Requests are counted on the day a swap was requested; approvals, rejections,
+rehomed items and redeemed points on the day it was resolved. The counters
+always describe the swaps in the Swap and SwapArchive tables, so incremental
+updates stay equal to a rebuild: when deleting a user or item takes swaps
+with it (or forgets the item offered in one), `deletion_started` and
+`deletion_finished` take their counts back out.
+"""
+import datetime
+import heapq
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import User, Swap, SwapArchive, DailyStat, CommunityTotal, LeaderboardEntry
+
+LEADERBOARD_SIZE = 10
+
+# How many days `community_stats` lists, counting today
+RECENT_DAYS = 30
+WEEK = 7
+
+POINTS_IN_CIRCULATION = 'points_in_circulation'
+
+CACHE_KEY = 'community_stats'
+CACHE_TIMEOUT = 60 # seconds
+
+BATCH_SIZE = 2000
+
+# Columns needed to count a swap, in counts_for() argument order
+SWAP_FIELDS = ('created_at', 'resolved_at', 'status', 'requested_item_id', 'item__point_value')
+ARCHIVE_FIELDS = ('created_at', 'resolved_at', 'status', 'requested_item_id', 'point_value')
+
+
+def counts_for(created_at, resolved_at, status, requested_item_id, point_value):
+    """The (day, counter) pairs and amounts a swap in `status` adds to DailyStat."""
+    counts = {(timezone.localdate(created_at), 'swaps_requested'): 1}
+    # Swaps resolved before resolved_at existed only know when they were requested
+    day = timezone.localdate(resolved_at or created_at)
+    if status in ('approved', 'completed'):
+        counts[(day, 'swaps_approved')] = 1
+        # An item-for-item swap rehomes both items
+        counts[(day, 'items_rehomed')] = 2 if requested_item_id else 1
+        if not requested_item_id and point_value:
+            counts[(day, 'points_redeemed')] = point_value
+    elif status == 'rejected':
+        counts[(day, 'swaps_rejected')] = 1
+    return counts
+
+
+def add(changes):
+    """Adds {(day, counter): amount} to the daily counters, in one UPDATE per day."""
+    by_day = defaultdict(dict)
+    for (day, counter), amount in changes.items():
+        if amount:
+            by_day[day][counter] = by_day[day].get(counter, 0) + amount
+    if not by_day:
+        return
+    DailyStat.objects.bulk_create([DailyStat(date=day) for day in by_day], ignore_conflicts=True)
+    for day, amounts in by_day.items():
+        DailyStat.objects.filter(date=day).update(**{counter: F(counter) + amount for counter, amount in amounts.items()})
+
+
+def swap_requested(swap):
+    add(counts_for(swap.created_at, None, 'pending', swap.requested_item_id, None))
+
+
+def swaps_resolved(rows, status, resolved_at):
+    """
+    Moves pending swaps to `status` in the counters, as of `resolved_at`.
+    `rows` are (created_at, requested_item_id, point_value) of each swap.
+    """
+    changes = Counter()
+    for created_at, requested_item_id, point_value in rows:
+        changes.update(counts_for(created_at, resolved_at, status, requested_item_id, point_value))
+        changes.subtract(counts_for(created_at, None, 'pending', requested_item_id, point_value))
+    add(changes)
+
+
+def _current_counts(keys):
+    """{key: counts} for ('swap', id) and ('archive', id) keys; rows that are gone count nothing."""
+    counts = dict.fromkeys(keys, {})
+    for kind, model, fields in (('swap', Swap, SWAP_FIELDS), ('archive', SwapArchive, ARCHIVE_FIELDS)):
+        ids = [pk for key_kind, pk in keys if key_kind == kind]
+        for start in range(0, len(ids), BATCH_SIZE):
+            for pk, *row in model.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).values_list('pk', *fields):
+                counts[(kind, pk)] = counts_for(*row)
+    return counts
+
+
+def deletion_started(origin, swaps, archived_swaps):
+    """
+    Remembers how the swaps in `swaps` and `archived_swaps` (querysets) are
+    counted before a deletion started at `origin` deletes or changes them.
+    Called from pre_delete; a cascade can call it many times.
+    """
+    if not hasattr(origin, '_swap_counts_before'):
+        origin._swap_counts_before = {}
+    before = origin._swap_counts_before
+    keys = [('swap', pk) for pk in swaps.values_list('pk', flat=True)]
+    keys += [('archive', pk) for pk in archived_swaps.values_list('pk', flat=True)]
+    before.update(_current_counts([key for key in keys if key not in before]))
+
+
+def deletion_finished(origin):
+    """
+    Takes the swaps remembered by deletion_started out of the counters, or
+    recounts the ones that changed. Called from post_delete after each step
+    of the cascade, so it only applies what changed since the last call.
+    """
+    before = getattr(origin, '_swap_counts_before', None)
+    if not before:
+        return
+    after = _current_counts(list(before))
+    changes = Counter()
+    for key, counts in after.items():
+        if counts != before[key]:
+            changes.update(counts)
+            changes.subtract(before[key])
+    before.update(after)
+    add(changes)
+
+
+def points_changed(deltas):
+    """
+    Records the points change of each user in {user_id: delta}. Call it after
+    the users' points were written; deleted users are taken off the board.
+    """
+    total = sum(deltas.values())
+    if total:
+        CommunityTotal.objects.get_or_create(name=POINTS_IN_CIRCULATION)
+        CommunityTotal.objects.filter(name=POINTS_IN_CIRCULATION).update(value=F('value') + total)
+    update_leaderboard(deltas)
+
+
+def _rank(user_id, points):
+    # Higher is better; ties go to the older account, as in the leaderboard ordering
+    return (points, -user_id)
+
+
+def update_leaderboard(user_ids):
+    """
+    Re-places `user_ids` on the leaderboard after their points changed.
+    Users who gained points are moved in place. When someone on the board
+    loses points or goes away, a user who isn't on it may now rank higher, so
+    the board is refilled from the points index instead.
+    """
+    user_ids = set(user_ids)
+    points = dict(User.objects.filter(pk__in=user_ids).values_list('id', 'points'))
+    board = dict(LeaderboardEntry.objects.values_list('user_id', 'points'))
+
+    demoted = any(user_id in board and points.get(user_id, float('-inf')) < board[user_id] for user_id in user_ids)
+    # A board that isn't full (few users yet, or one just deleted) takes anyone
+    not_full = len(board) < LEADERBOARD_SIZE and not user_ids <= board.keys()
+    if demoted or not_full:
+        refill_leaderboard()
+        return
+
+    # Work out the new board first, so a bulk refund to hundreds of users costs
+    # at most LEADERBOARD_SIZE row writes rather than one per user
+    top = dict(heapq.nlargest(LEADERBOARD_SIZE, {**board, **points}.items(), key=lambda entry: _rank(*entry)))
+    dropped = [user_id for user_id in board if user_id not in top]
+    if dropped:
+        LeaderboardEntry.objects.filter(user_id__in=dropped).delete()
+    LeaderboardEntry.objects.bulk_create(
+        [LeaderboardEntry(user_id=user_id, points=top[user_id]) for user_id in top if user_id not in board]
+    )
+    for user_id, user_points in top.items():
+        if user_id in board and user_points != board[user_id]:
+            LeaderboardEntry.objects.filter(user_id=user_id).update(points=user_points)
+
+
+def refill_leaderboard():
+    top = User.objects.order_by('-points', 'id').values_list('id', 'points')[:LEADERBOARD_SIZE]
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create([LeaderboardEntry(user_id=user_id, points=points) for user_id, points in top])
+
+
+def rebuild():
+    """
+    Recomputes every counter, the points total and the leaderboard from the
+    Swap, SwapArchive and User tables, streaming each in batches. Run it in a
+    transaction so readers never see a half-built state.
+    """
+    counts = Counter()
+    for model, fields in ((Swap, SWAP_FIELDS), (SwapArchive, ARCHIVE_FIELDS)):
+        for row in model.objects.order_by().values_list(*fields).iterator(chunk_size=BATCH_SIZE):
+            counts.update(counts_for(*row))
+
+    by_day = defaultdict(dict)
+    for (day, counter), amount in counts.items():
+        by_day[day][counter] = amount
+    DailyStat.objects.all().delete()
+    DailyStat.objects.bulk_create(
+        [DailyStat(date=day, **amounts) for day, amounts in by_day.items()],
+        batch_size=1000,
+    )
+
+    total = 0
+    top = []
+    for user_id, points in User.objects.order_by().values_list('id', 'points').iterator(chunk_size=BATCH_SIZE):
+        total += points
+        entry = (_rank(user_id, points), user_id, points)
+        if len(top) < LEADERBOARD_SIZE:
+            heapq.heappush(top, entry)
+        elif entry > top[0]:
+            heapq.heapreplace(top, entry)
+    CommunityTotal.objects.update_or_create(name=POINTS_IN_CIRCULATION, defaults={'value': total})
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create([LeaderboardEntry(user_id=user_id, points=points) for _, user_id, points in top])
+
+    cache.delete(CACHE_KEY)
+    return len(by_day)
+
+
+def community_stats():
+    """Reads the stats from the summary tables; see cached_community_stats for the endpoint."""
+    today = timezone.localdate()
+    counters = ['swaps_requested', 'swaps_approved', 'swaps_rejected', 'items_rehomed', 'points_redeemed']
+
+    all_time = DailyStat.objects.aggregate(**{counter: Sum(counter) for counter in counters})
+    recent = {
+        row['date']: row
+        for row in DailyStat.objects.filter(date__gt=today - datetime.timedelta(days=RECENT_DAYS)).values('date', *counters)
+    }
+    days = []
+    for offset in range(RECENT_DAYS):
+        day = today - datetime.timedelta(days=offset)
+        row = recent.get(day, {})
+        days.append({'date': day.isoformat(), **{counter: row.get(counter, 0) for counter in counters}})
+    this_week = {counter: sum(day[counter] for day in days[:WEEK]) for counter in counters}
+
+    points_total = CommunityTotal.objects.filter(name=POINTS_IN_CIRCULATION).values_list('value', flat=True).first()
+    leaderboard = LeaderboardEntry.objects.select_related('user')
+    return {
+        'points_in_circulation': points_total or 0,
+        'all_time': {counter: all_time[counter] or 0 for counter in counters},
+        'this_week': this_week,
+        'days': days,
+        'leaderboard': [
+            {'rank': rank, 'id': entry.user_id, 'username': entry.user.username, 'points': entry.points}
+            for rank, entry in enumerate(leaderboard, start=1)
+        ],
+    }
+
+
+def cached_community_stats():
+    # The numbers are shared by every visitor and may lag the writes by CACHE_TIMEOUT
+    return cache.get_or_set(CACHE_KEY, community_stats, CACHE_TIMEOUT)
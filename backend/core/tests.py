@@ -0,0 +1,646 @@
+import contextlib
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from core import archive, projections, services, stats, throttling
+from core.middleware import ConcurrencyLimitMiddleware
+from core.renderers import FastJSONRenderer
+from core.concurrency import BULK_CHUNK_SIZE, VersionConflict, bulk_versioned_update, versioned_update
+from core.models import User, Item, Swap, DomainEvent, ActivityEntry, ProjectionCheckpoint, ItemFacetCount, SwapArchive, DailyStat, CommunityTotal, LeaderboardEntry
+
+STARTING_POINTS = 100
+POINT_VALUE = 20
+
+
+def batches(rows, size):
+    return -(-rows // size)
+
+
+class CompetingSwapsTests(TestCase):
+    """Approving one swap rejects every other pending swap for the same item."""
+
+    def make_competition(self, name, redemptions, offers):
+        """
+        An item wanted by `redemptions` point redemptions and `offers`
+        item-for-item swaps, all pending. Returns (item, swaps).
+        """
+        owner = User.objects.create(email=f'{name}-owner@example.com', username=f'{name}-owner', points=STARTING_POINTS)
+        item = Item.objects.create(
+            title=f'{name} jacket', description='Wanted by everyone', uploader=owner,
+            point_value=POINT_VALUE, moderation_status='approved',
+        )
+        requesters = User.objects.bulk_create([
+            # Redeemers already paid for their request when they made it
+            User(email=f'{name}-{i}@example.com', username=f'{name}-{i}',
+                 points=STARTING_POINTS - POINT_VALUE if i < redemptions else STARTING_POINTS)
+            for i in range(redemptions + offers)
+        ])
+        offered = Item.objects.bulk_create([
+            # Offering an item takes it off the catalog until the swap is resolved
+            Item(title=f'{name} offer {i}', description='Offered', uploader=user,
+                 moderation_status='approved', available=False)
+            for i, user in enumerate(requesters[redemptions:])
+        ])
+        Swap.objects.bulk_create(
+            [Swap(user=user, item=item) for user in requesters[:redemptions]]
+            + [Swap(user=offer.uploader, item=item, requested_item=offer) for offer in offered]
+        )
+        return item, list(Swap.objects.filter(item=item).select_related('user', 'item__uploader', 'requested_item').order_by('id'))
+
+    def approve(self, swap):
+        with contextlib.redirect_stdout(io.StringIO()), transaction.atomic():
+            services.approve_swap(swap)
+
+    def test_hundreds_of_competing_requests_are_rejected_and_refunded(self):
+        item, swaps = self.make_competition('big', redemptions=200, offers=100)
+        winner, competing = swaps[0], swaps[1:]
+
+        self.approve(winner)
+
+        self.assertEqual(Swap.objects.get(pk=winner.pk).status, 'approved')
+        self.assertFalse(Swap.objects.filter(item=item).exclude(pk=winner.pk).exclude(status='rejected').exists())
+        self.assertEqual(Swap.objects.filter(item=item, status='rejected').count(), len(competing))
+
+        offered_ids = [swap.requested_item_id for swap in competing if swap.requested_item_id]
+        self.assertEqual(len(offered_ids), 100)
+        self.assertEqual(Item.objects.filter(pk__in=offered_ids, available=True).count(), len(offered_ids))
+        self.assertFalse(Item.objects.get(pk=item.pk).available)
+
+        # Every requester ends up where they started: refunded once, not twice
+        requester_ids = [swap.user_id for swap in competing]
+        points = set(User.objects.filter(pk__in=requester_ids).values_list('points', flat=True))
+        self.assertEqual(points, {STARTING_POINTS})
+        self.assertEqual(User.objects.get(pk=winner.user_id).points, STARTING_POINTS - POINT_VALUE)
+        self.assertEqual(User.objects.get(pk=item.uploader_id).points, STARTING_POINTS + POINT_VALUE)
+
+    def test_resolution_time_is_recorded(self):
+        item, swaps = self.make_competition('timed', redemptions=2, offers=1)
+        self.approve(swaps[0])
+        resolved = set(Swap.objects.filter(item=item).values_list('resolved_at', flat=True))
+        # The winner and the swaps it pushed out are resolved at the same moment
+        self.assertEqual(resolved, {swaps[0].resolved_at})
+        self.assertIsNotNone(swaps[0].resolved_at)
+
+    def test_query_count_does_not_grow_with_competing_requests(self):
+        _, small = self.make_competition('small', redemptions=4, offers=2)
+        with CaptureQueriesContext(connection) as queries:
+            self.approve(small[0])
+
+        # Nothing is done per swap. The only extra statements are the batches
+        # the database needs for the bulk writes: the conditional UPDATE of the
+        # rejected swaps and the INSERT of their events (a rejection each, plus
+        # a refund for each redemption; the approval's own events are separate).
+        def bulk_statements(redemptions, offers):
+            competing = redemptions - 1 + offers
+            event_fields = [field for field in DomainEvent._meta.concrete_fields if not field.primary_key]
+            event_batch = connection.ops.bulk_batch_size(event_fields, [None] * competing) or competing
+            return batches(competing, BULK_CHUNK_SIZE) + batches(competing + redemptions - 1, event_batch)
+
+        _, big = self.make_competition('big', redemptions=200, offers=100)
+        with self.assertNumQueries(len(queries) - bulk_statements(4, 2) + bulk_statements(200, 100)):
+            self.approve(big[0])
+
+
+class OptimisticConcurrencyTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com', username='owner')
+        self.item = Item.objects.create(title='Coat', description='Warm', uploader=self.owner, moderation_status='approved')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/items/{self.item.pk}/'
+
+    def patch(self, data, if_match=None):
+        headers = {'If-Match': if_match} if if_match else {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.patch(self.url, data, format='json', headers=headers)
+
+    def concurrent_write(self, *args, **kwargs):
+        # Another request changes the row after this one read it
+        Item.objects.filter(pk=self.item.pk).update(title='Changed meanwhile', version=F('version') + 1)
+        return versioned_update(*args, **kwargs)
+
+    def test_update_bumps_the_version_and_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"1"')
+        response = self.patch({'title': 'Long coat'}, if_match='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+        self.assertEqual(Item.objects.get(pk=self.item.pk).version, 2)
+
+    def test_stale_if_match_is_412(self):
+        self.patch({'title': 'Long coat'}, if_match='"1"')
+        response = self.patch({'title': 'Short coat'}, if_match='"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Item.objects.get(pk=self.item.pk).title, 'Long coat')
+
+    def test_lost_conditional_update_is_409(self):
+        with mock.patch('core.views.versioned_update', self.concurrent_write):
+            response = self.patch({'title': 'Long coat'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Item.objects.get(pk=self.item.pk).title, 'Changed meanwhile')
+
+    def test_lost_conditional_update_with_if_match_is_412(self):
+        with mock.patch('core.views.versioned_update', self.concurrent_write):
+            response = self.patch({'title': 'Long coat'}, if_match='"1"')
+        self.assertEqual(response.status_code, 412)
+
+    def test_versioned_update_sends_save_signals(self):
+        received = []
+        def receiver(signal, sender, instance, update_fields, **kwargs):
+            received.append((signal, instance.version, set(update_fields)))
+        pre_save.connect(receiver, sender=Item)
+        post_save.connect(receiver, sender=Item)
+        self.addCleanup(pre_save.disconnect, receiver, sender=Item)
+        self.addCleanup(post_save.disconnect, receiver, sender=Item)
+
+        self.item.title = 'Long coat'
+        versioned_update(self.item, ['title'])
+
+        self.assertEqual(received, [(pre_save, 1, {'title'}), (post_save, 2, {'title', 'version'})])
+
+    def test_signals_keep_facet_counts_right(self):
+        self.assertEqual(ItemFacetCount.objects.get(facet='all').count, 1)
+        self.item.available = False
+        versioned_update(self.item, ['available'])
+        self.assertEqual(ItemFacetCount.objects.get(facet='all').count, 0)
+
+    def test_bulk_update_raises_if_any_row_changed(self):
+        other = Item.objects.create(title='Hat', description='Wool', uploader=self.owner)
+        versions = {self.item.pk: self.item.version, other.pk: other.version}
+        Item.objects.filter(pk=other.pk).update(version=F('version') + 1)
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            bulk_versioned_update(Item, versions, featured=True)
+        self.assertFalse(Item.objects.filter(featured=True).exists())
+
+    def test_moderation_with_stale_if_match_is_412(self):
+        staff = User.objects.create(email='mod@example.com', username='mod', is_staff=True)
+        self.client.force_authenticate(staff)
+        url = f'/api/moderator/items/{self.item.pk}/reject/'
+        with contextlib.redirect_stdout(io.StringIO()):
+            stale = self.client.patch(url, headers={'If-Match': '"0"'})
+            fresh = self.client.patch(url, headers={'If-Match': '"1"'})
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh['ETag'], '"2"')
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com', username='owner', points=100)
+        self.requester = User.objects.create(email='requester@example.com', username='requester', points=100)
+        self.cutoff = timezone.now() - datetime.timedelta(days=90)
+        self.long_ago = self.cutoff - datetime.timedelta(days=10)
+
+    def make_swap(self, title, created_at, resolved_at=None, status='pending'):
+        item = Item.objects.create(title=title, description='Old', uploader=self.owner, point_value=10, moderation_status='approved')
+        swap = Swap.objects.create(user=self.requester, item=item)
+        Swap.objects.filter(pk=swap.pk).update(created_at=created_at, resolved_at=resolved_at, status=status)
+        return Swap.objects.select_related('user', 'item__uploader', 'requested_item').get(pk=swap.pk)
+
+    def archive(self):
+        return sum(archive.archive_swaps(self.cutoff))
+
+    def test_archives_by_resolution_time(self):
+        resolved_long_ago = self.make_swap('Old news', self.long_ago, self.long_ago, 'approved')
+        requested_long_ago = self.make_swap('Slow decision', self.long_ago)
+        with contextlib.redirect_stdout(io.StringIO()), transaction.atomic():
+            services.reject_swap(requested_long_ago)
+
+        self.assertEqual(self.archive(), 1)
+        self.assertEqual(list(SwapArchive.objects.values_list('swap_id', 'resolved_at')), [(resolved_long_ago.pk, self.long_ago)])
+        # Rejected just now, so it stays in the Swap table however old the request is
+        self.assertTrue(Swap.objects.filter(pk=requested_long_ago.pk, status='rejected').exists())
+
+    def test_pending_swaps_are_never_archived(self):
+        self.make_swap('Forgotten', self.long_ago)
+        self.assertEqual(self.archive(), 0)
+
+
+@override_settings(THROTTLE_RATES={})
+class CommunityStatsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com', username='owner', points=100)
+        self.redeemer = User.objects.create(email='redeemer@example.com', username='redeemer', points=100)
+        self.trader = User.objects.create(email='trader@example.com', username='trader', points=100)
+        self.coat = self.make_item('Coat', self.owner, point_value=30)
+        self.scarf = self.make_item('Scarf', self.owner, point_value=20)
+        self.boots = self.make_item('Boots', self.trader)
+
+    def make_item(self, title, uploader, point_value=None):
+        return Item.objects.create(title=title, description='Used', uploader=uploader, point_value=point_value, moderation_status='approved')
+
+    def call(self, user, method, url, data=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = getattr(client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json()
+
+    def request_swap(self, user, item, offered=None, days_ago=0):
+        # created_at comes from auto_now_add, so move the clock for requests made earlier
+        when = timezone.now() - datetime.timedelta(days=days_ago)
+        data = {'item_id': item.pk, 'requested_item_id': offered.pk if offered else None}
+        with mock.patch('django.utils.timezone.now', return_value=when):
+            return self.call(user, 'post', '/api/swaps/create/', data)['id']
+
+    def snapshot(self):
+        counters = ['swaps_requested', 'swaps_approved', 'swaps_rejected', 'items_rehomed', 'points_redeemed']
+        days = {
+            row[0]: row[1:] for row in DailyStat.objects.values_list('date', *counters)
+            if any(row[1:]) # a rebuild doesn't keep days whose counts went back to zero
+        }
+        return days, list(CommunityTotal.objects.values_list('name', 'value')), list(LeaderboardEntry.objects.values_list('user_id', 'points'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        with transaction.atomic():
+            stats.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_incremental_updates_match_a_rebuild(self):
+        redemption = self.request_swap(self.redeemer, self.coat, days_ago=3)
+        trade = self.request_swap(self.trader, self.coat, offered=self.boots, days_ago=1)
+        declined = self.request_swap(self.redeemer, self.scarf)
+        self.assertMatchesRebuild()
+
+        self.call(self.owner, 'patch', f'/api/swaps/{redemption}/approve/') # also turns down the trade
+        self.call(self.owner, 'patch', f'/api/swaps/{declined}/disapprove/')
+        self.assertEqual(Swap.objects.get(pk=trade).status, 'rejected')
+        self.assertMatchesRebuild()
+
+        # A new trade is approved, then the offered item is deleted and the swap forgets it
+        hat = self.make_item('Hat', self.trader)
+        gloves = self.make_item('Gloves', self.owner, point_value=10)
+        self.call(self.owner, 'patch', f"/api/swaps/{self.request_swap(self.trader, gloves, offered=hat)}/approve/")
+        hat.delete()
+        self.assertMatchesRebuild()
+
+        belt = self.make_item('Belt', self.owner, point_value=10)
+        self.request_swap(self.redeemer, belt) # still pending, so it stays in the Swap table
+        self.assertEqual(sum(archive.archive_swaps(timezone.now() + datetime.timedelta(minutes=1))), 4)
+        self.assertMatchesRebuild()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.trader.delete() # takes their archived trades with it
+            belt.delete() # and the pending redemption
+        self.assertMatchesRebuild()
+        self.redeemer.delete()
+        self.assertMatchesRebuild()
+        self.assertFalse(Swap.objects.exists())
+
+    def test_resolutions_count_on_the_day_they_happen(self):
+        swap = self.request_swap(self.redeemer, self.coat, days_ago=3)
+        self.call(self.owner, 'patch', f'/api/swaps/{swap}/approve/')
+
+        today = timezone.localdate()
+        requested_day = today - datetime.timedelta(days=3)
+        days = {row['date']: row for row in stats.community_stats()['days']}
+        self.assertEqual((days[requested_day.isoformat()]['swaps_requested'], days[requested_day.isoformat()]['swaps_approved']), (1, 0))
+        self.assertEqual((days[today.isoformat()]['swaps_requested'], days[today.isoformat()]['swaps_approved']), (0, 1))
+        self.assertEqual(days[today.isoformat()]['points_redeemed'], 30)
+        self.assertMatchesRebuild()
+
+
+class MediaStorageTests(TestCase):
+    # Settings are read once per process, so each profile gets a fresh interpreter
+    SCRIPT = (
+        "import sys, django; django.setup(); "
+        "from core.models import Item; "
+        "loaded_at_startup = 'cloudinary_storage' in sys.modules; "
+        "storage = Item._meta.get_field('image').storage; storage._setup(); "
+        "print(loaded_at_startup, type(storage._wrapped).__name__)"
+    )
+
+    def run_with_profile(self, profile):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'rewear.settings', 'REWEAR_MEDIA_STORAGE': profile}
+        return subprocess.run(
+            [sys.executable, '-c', self.SCRIPT], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+
+    def test_profile_selects_the_backend(self):
+        self.assertEqual(self.run_with_profile('local').stdout.split(), ['False', 'FileSystemStorage'])
+        try:
+            import cloudinary_storage # noqa: F401
+        except ImportError:
+            return
+        # The SDK is still only imported once media is used
+        self.assertEqual(self.run_with_profile('cloudinary').stdout.split(), ['False', 'MediaCloudinaryStorage'])
+
+    def test_unknown_profile_is_a_configuration_error(self):
+        result = self.run_with_profile('bogus')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
+
+
+@override_settings(THROTTLE_RATES={'default': {'user': '2/min', 'anon': '2/min'}}, THROTTLE_STORE='memory')
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+
+    def get(self, **headers):
+        return APIClient().get('/api/csrf/', **headers)
+
+    def test_over_the_rate_gets_429_with_retry_after(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            statuses = [self.get().status_code for _ in range(3)]
+            response = self.get()
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_forged_forwarded_for_does_not_reset_the_bucket(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            statuses = [self.get(HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code for i in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_behind_a_proxy_clients_are_told_apart_by_the_address_it_added(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}), \
+                contextlib.redirect_stdout(io.StringIO()):
+            # Whatever a client puts in front of the proxy's entry is ignored
+            forged = [self.get(HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7').status_code for i in range(3)]
+            other = self.get(HTTP_X_FORWARDED_FOR='203.0.113.8').status_code
+        self.assertEqual(forged, [200, 200, 429])
+        self.assertEqual(other, 200)
+
+
+@override_settings(ADMISSION_MAX_CONCURRENT=1, ADMISSION_MAX_PER_CLIENT=1, ADMISSION_QUEUE_TIMEOUT=0.05)
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        self.entered = threading.Event()
+        self.leave = threading.Event()
+        self.addCleanup(self.leave.set)
+        self.middleware = ConcurrencyLimitMiddleware(self.view)
+
+    def view(self, request):
+        if request.path == '/api/slow/':
+            self.entered.set()
+            self.leave.wait(5)
+        return JsonResponse({})
+
+    def request(self, path, ip, **headers):
+        return self.middleware(RequestFactory().get(path, REMOTE_ADDR=ip, **headers))
+
+    def occupy(self, ip):
+        responses = []
+        thread = threading.Thread(target=lambda: responses.append(self.request('/api/slow/', ip)))
+        thread.start()
+        self.assertTrue(self.entered.wait(5))
+        return thread, responses
+
+    def test_busy_server_answers_503(self):
+        thread, responses = self.occupy('192.0.2.1')
+        response = self.request('/api/items/', '192.0.2.2')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        # Paths outside ADMISSION_CONTROL_PATHS aren't held back
+        self.assertEqual(self.request('/admin/', '192.0.2.2').status_code, 200)
+
+        self.leave.set()
+        thread.join()
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertEqual(self.request('/api/items/', '192.0.2.2').status_code, 200)
+
+    def test_client_over_its_share_gets_429_even_with_forged_forwarded_for(self):
+        thread, _ = self.occupy('192.0.2.1')
+        response = self.request('/api/items/', '192.0.2.1', HTTP_X_FORWARDED_FOR='198.51.100.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.leave.set()
+        thread.join()
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com', username='owner')
+        Item.objects.create(title='Coat', description='Warm', uploader=self.owner, moderation_status='approved', point_value=30)
+
+    def get_items(self, query):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = APIClient().get(f'/api/items/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()[0]
+
+    def test_fields_trim_the_response(self):
+        self.assertEqual(self.get_items('fields=id,title,point_value').keys(), {'id', 'title', 'point_value'})
+
+    def test_unexpanded_relation_is_an_id(self):
+        self.assertEqual(self.get_items('fields=id,uploader')['uploader'], self.owner.pk)
+
+    def test_dotted_fields_reach_into_expanded_objects(self):
+        item = self.get_items('expand=uploader&fields=id,uploader.email')
+        self.assertEqual(item['uploader'], {'email': 'owner@example.com'})
+
+    def test_expanded_object_without_dotted_fields_is_whole(self):
+        item = self.get_items('expand=uploader&fields=id,uploader')
+        self.assertEqual(item['uploader']['username'], 'owner')
+        self.assertIn('points', item['uploader'])
+
+    def test_no_parameters_render_everything(self):
+        item = self.get_items('')
+        self.assertEqual(item['uploader']['email'], 'owner@example.com')
+        self.assertIn('description', item)
+
+
+class RenderingTests(TestCase):
+    def test_fast_renderer_matches_drf(self):
+        data = {
+            'when': datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2026, 1, 2),
+            'price': decimal.Decimal('1.50'),
+            'items': [{'id': 1, 'title': 'Coat ☂'}],
+            'none': None,
+        }
+        fast = FastJSONRenderer().render(data, 'application/json')
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data, 'application/json')))
+
+    def test_fast_renderer_honours_indent(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertIn(b'\n  ', rendered)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create(email='owner@example.com', username='owner')
+        Item.objects.bulk_create([
+            Item(title=f'Coat {i}', description='Warm and long ' * 5, uploader=owner, moderation_status='approved')
+            for i in range(30)
+        ])
+
+    def get(self, url, accept_encoding):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.get(url, headers={'Accept-Encoding': accept_encoding} if accept_encoding else {})
+
+    def test_brotli_when_accepted(self):
+        if brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self.get('/api/items/', 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(brotli.decompress(response.content))), 30)
+
+    def test_gzip_without_brotli(self):
+        response = self.get('/api/items/', 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 30)
+
+    def test_identity_when_nothing_accepted(self):
+        response = self.get('/api/items/', None)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.get('/api/csrf/', 'gzip, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ImportItemsEndpointTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='mod@example.com', username='mod', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def import_rows(self, *rows):
+        content = ''.join(json.dumps(row) + '\n' for row in rows).encode()
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.post('/api/moderator/items/import/', {'file': SimpleUploadedFile('items.ndjson', content)})
+
+    def test_image_urls_are_not_fetched(self):
+        with mock.patch('urllib.request.urlopen') as urlopen:
+            response = self.import_rows({'title': 'Coat', 'description': 'Warm', 'image': 'http://169.254.169.254/latest/meta-data'})
+        urlopen.assert_not_called()
+        self.assertEqual(response.data['created'], 0)
+        self.assertIn('image', response.data['errors'][0]['errors'])
+
+    def test_image_refs_must_exist_in_storage(self):
+        response = self.import_rows(
+            {'title': 'Coat', 'description': 'Warm', 'image': 'items/missing.jpg'},
+            {'title': 'Scarf', 'description': 'Long'},
+        )
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1])
+        self.assertFalse(Item.objects.filter(title='Coat').exists())
+
+    def test_unreadable_file_reports_where_to_resume(self):
+        # Enough good rows that a batch commits before the bad byte is decoded
+        content = b'title,description\n' + b''.join(b'Coat %d,Warm\n' % i for i in range(1500)) + b'Hat,\xff\xfe broken\n'
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post('/api/moderator/items/import/', {'file': SimpleUploadedFile('items.csv', content)})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+        self.assertGreater(response.data['created'], 0)
+        self.assertEqual(response.data['created'], response.data['last_row'])
+        self.assertEqual(Item.objects.count(), response.data['created'])
+
+
+class ParameterValidationTests(TestCase):
+    """Malformed query parameters are a 400, never a 500."""
+
+    def assertBadRequest(self, url, field, user=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(field, response.data)
+
+    def test_non_ascii_digits_in_uploader_filter(self):
+        self.assertBadRequest('/api/items/?uploader=²', 'uploader')
+
+    def test_facet_numbers_beyond_64_bits(self):
+        huge = '9' * 30
+        self.assertBadRequest(f'/api/items/?points_min={huge}', 'points_min')
+        self.assertBadRequest(f'/api/items/?points_max=-{huge}', 'points_max')
+        self.assertBadRequest(f'/api/items/?uploader=1,{huge}', 'uploader')
+
+    def test_non_ascii_digits_in_batch_ids(self):
+        self.assertBadRequest('/api/items/batch/?ids=1,²', 'ids')
+        user = User.objects.create(email='batch@example.com', username='batch')
+        self.assertBadRequest('/api/swaps/batch/?ids=²', 'ids', user=user)
+
+    def test_batch_ids_beyond_64_bits(self):
+        self.assertBadRequest(f'/api/items/batch/?ids=1,{"9" * 30}', 'ids')
+        self.assertBadRequest(f'/api/items/batch/?ids={2 ** 63}', 'ids')
+        user = User.objects.create(email='batch@example.com', username='batch')
+        self.assertBadRequest(f'/api/swaps/batch/?ids={"9" * 30}', 'ids', user=user)
+
+    def test_non_ascii_digits_in_nearby_limit(self):
+        self.assertBadRequest('/api/items/nearby/?lat=1&lng=1&limit=²', 'limit')
+        self.assertBadRequest('/api/items/nearby/?lat=1&lng=1&limit=-5', 'limit')
+
+
+class ProjectionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com', username='owner')
+        self.first = User.objects.create(email='first@example.com', username='first')
+        self.second = User.objects.create(email='second@example.com', username='second')
+        self.item = Item.objects.create(
+            title='Boots', description='Size 42', uploader=self.owner,
+            point_value=POINT_VALUE, moderation_status='approved',
+        )
+
+    def request_item(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.post('/api/swaps/create/', {'item_id': self.item.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Swap.objects.select_related('user', 'item__uploader', 'requested_item').get(pk=response.data['id'])
+
+    def test_rebuild_after_a_user_was_deleted(self):
+        swap = self.request_item(self.first)
+        self.request_item(self.second)
+        with contextlib.redirect_stdout(io.StringIO()), transaction.atomic():
+            services.approve_swap(swap, actor=self.owner)
+        self.second.delete()
+
+        for projector in projections.PROJECTORS.values():
+            projections.rebuild(projector)
+
+        self.assertFalse(ActivityEntry.objects.filter(user_id=self.second.pk).exists())
+        self.assertTrue(ActivityEntry.objects.filter(user_id=self.first.pk, type='swap.approved').exists())
+
+    def test_catch_up_after_a_user_was_deleted(self):
+        self.request_item(self.first)
+        self.first.delete() # between the write and the projector run
+
+        projections.catch_up()
+        self.request_item(self.second)
+        projections.catch_up()
+
+        self.assertEqual(ProjectionCheckpoint.objects.get(name='activity_feed').position, DomainEvent.objects.latest('id').id)
+        self.assertTrue(ActivityEntry.objects.filter(user_id=self.second.pk).exists())
+
+    def test_one_catch_up_per_transaction(self):
+        swap = self.request_item(self.first)
+        self.request_item(self.second)
+        with override_settings(PROJECTIONS_RUN_ON_COMMIT=True), self.captureOnCommitCallbacks() as callbacks:
+            with contextlib.redirect_stdout(io.StringIO()), transaction.atomic():
+                # Records the approval, the owner's points, the competing rejection and its refund
+                services.approve_swap(swap, actor=self.owner)
+        self.assertEqual(len(callbacks), 1)
@@ -0,0 +1,149 @@
+"""
+Token-bucket throttling per route and per client.
+
+THROTTLE_RATES maps a route name from core/urls.py (optionally with the
+method, e.g. 'items:POST') to rates for signed in users ('user') and
+anonymous clients ('anon'); routes without an entry use 'default'. A rate
+like '20/min' is a bucket of 20 requests that refills evenly over a minute,
+so short bursts go through and a steady client gets 20 a minute. A rate of
+None switches throttling off for that route and kind of client.
+
+Users are counted by id and anonymous clients by IP, see client_ip().
+Buckets live in process memory by default, or in the Django cache with
+THROTTLE_STORE = 'cache' so that every process shares them.
+"""
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Past this many buckets, the memory store forgets the ones that have refilled completely
+MAX_MEMORY_BUCKETS = 100000
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'20/min' -> (capacity 20, refill of 20/60 tokens per second)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / DURATIONS[period.strip()[0]]
+
+
+def refill(tokens, updated_at, capacity, per_second, now):
+    return min(capacity, tokens + (now - updated_at) * per_second)
+
+
+class MemoryBucketStore:
+    """Buckets in a dict, shared by the threads of one process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {} # key -> (tokens, updated_at, capacity, per_second)
+        self.pruned_at = 0
+
+    def take(self, key, capacity, per_second, now=None):
+        """Takes one token. Returns (allowed, seconds until a token is available)."""
+        now = time.time() if now is None else now
+        with self.lock:
+            tokens, updated_at, _, _ = self.buckets.get(key, (capacity, now, capacity, per_second))
+            tokens = refill(tokens, updated_at, capacity, per_second, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now, capacity, per_second)
+            if len(self.buckets) > MAX_MEMORY_BUCKETS and now - self.pruned_at > 1:
+                self.prune(now)
+        return allowed, 0 if allowed else (1 - tokens) / per_second
+
+    def prune(self, now):
+        # A full bucket is the same as no bucket, so it can be dropped
+        self.pruned_at = now
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if refill(bucket[0], bucket[1], bucket[2], bucket[3], now) < bucket[2]
+        }
+
+
+class CacheBucketStore:
+    """
+    Buckets in the default cache, shared by every process using it. The read
+    and write of a bucket aren't atomic, so under heavy concurrency a client
+    may get a few requests more than its rate.
+    """
+
+    def take(self, key, capacity, per_second, now=None):
+        now = time.time() if now is None else now
+        cache_key = f'throttle:{key}'
+        tokens, updated_at = cache.get(cache_key, (capacity, now))
+        tokens = refill(tokens, updated_at, capacity, per_second, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Once it has had time to refill, the bucket is full again and needn't be kept
+        cache.set(cache_key, (tokens, now), timeout=int(capacity / per_second) + 1)
+        return allowed, 0 if allowed else (1 - tokens) / per_second
+
+
+STORES = {'memory': MemoryBucketStore, 'cache': CacheBucketStore}
+_stores = {}
+
+
+def get_store():
+    name = getattr(settings, 'THROTTLE_STORE', 'memory')
+    if name not in _stores:
+        _stores[name] = STORES[name]()
+    return _stores[name]
+
+
+def client_ip(request):
+    """
+    The address anonymous clients are throttled and admitted by. With
+    REST_FRAMEWORK['NUM_PROXIES'] = 0 that is REMOTE_ADDR; with N proxies in
+    front, the address the outermost of them added to X-Forwarded-For. Left
+    unset, DRF would use the whole header as sent by the client, so anyone
+    could get a fresh bucket per request by changing it.
+    """
+    return BaseThrottle().get_ident(request)
+
+
+def rate_for(route, method, kind):
+    """
+    (scope, rate) for a route, method and 'user' or 'anon'. Requests in the
+    same scope share a bucket. The rate is None when they aren't throttled.
+    """
+    rates = getattr(settings, 'THROTTLE_RATES', {})
+    for scope in (f'{route}:{method}', route):
+        if scope in rates and kind in rates[scope]:
+            return scope, rates[scope][kind]
+    return route, rates.get('default', {}).get(kind)
+
+
+class RouteThrottle(BaseThrottle):
+    """
+    Applies THROTTLE_RATES to every API view (see REST_FRAMEWORK in settings),
+    per user id or, for anonymous clients, per client_ip().
+    """
+
+    def allow_request(self, request, view):
+        match = request.resolver_match
+        route = match.url_name if match else None
+        if request.user and request.user.is_authenticated:
+            kind, ident = 'user', f'user:{request.user.pk}'
+        else:
+            kind, ident = 'anon', f'ip:{client_ip(request)}'
+        scope, rate = rate_for(route, request.method, kind)
+        if rate is None:
+            return True
+
+        capacity, per_second = parse_rate(rate)
+        allowed, self.retry_after = get_store().take(f'{scope}:{ident}', capacity, per_second)
+        return allowed
+
+    def wait(self):
+        # DRF sends this as Retry-After with the 429
+        return self.retry_after
@@ -10,9 +10,17 @@ urlpatterns = [
     path('items/', views.ItemListCreateView.as_view(), name='items'),
     path('items/<int:pk>/', views.ItemDetailView.as_view(), name='item_detail'), # Now handles PUT/PATCH/DELETE
     path('items/featured/', views.featured_items, name='featured_items'),
+    path('items/facets/', views.item_facets, name='item_facets'),
+    path('items/batch/', views.items_batch, name='items_batch'), # ?ids=1,2,3
+    path('items/nearby/', views.items_nearby, name='items_nearby'), # ?lat=&lng=&radius=
+    path('items/<int:pk>/history/', views.item_history, name='item_history'), # Swap and moderation events
     path('swaps/', views.user_swaps, name='user_swaps'), # Swaps initiated by user
     path('my-item-swaps/', views.my_item_swaps, name='my_item_swaps'), # Swaps for user's items
     path('swaps/create/', views.create_swap, name='create_swap'),
+    path('swaps/batch/', views.swaps_batch, name='swaps_batch'), # ?ids=1,2,3
+    path('swaps/history/', views.swap_history, name='swap_history'), # Archived swaps, paginated
+    path('activity/', views.activity_feed, name='activity_feed'), # The user's event feed
+    path('stats/', views.community_stats, name='community_stats'), # Community stats and leaderboard
     path('swaps/<int:pk>/approve/', views.approve_swap, name='approve_swap'),
     path('swaps/<int:pk>/disapprove/', views.disapprove_swap, name='disapprove_swap'), # Disapprove swap
     
@@ -21,4 +29,6 @@ urlpatterns = [
     path('moderator/items/<int:pk>/approve/', views.approve_item, name='approve_item'),
     path('moderator/items/<int:pk>/reject/', views.reject_item, name='reject_item'),
     path('moderator/items/<int:pk>/delete/', views.delete_item_moderator, name='delete_item_moderator'),
+    path('moderator/items/import/', views.import_items, name='import_items'),
+    path('moderator/items/export/', views.export_items, name='export_items'),
 ]
@@ -1,20 +1,65 @@
+import io
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import login, logout
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
-from .models import User, Item, Swap
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import F, Q
+from .models import User, Item, Swap, SwapArchive, ActivityEntry, ItemHistoryEntry
 from .serializers import (
-    UserSerializer, UserRegistrationSerializer, LoginSerializer,
-    ItemSerializer, SwapSerializer
+    UserSerializer, ProfileSerializer, UserRegistrationSerializer, LoginSerializer,
+    ItemSerializer, SwapSerializer, SwapArchiveSerializer,
+    ActivityEntrySerializer, ItemHistoryEntrySerializer
 )
+from .pagination import HistoryPagination
 from .permissions import IsUploaderOrReadOnly, IsStaffUser # Import the new permission
-
-# POINTS_FOR_GIVING_ITEM is for when an item is swapped (not redeemed via points)
-POINTS_FOR_GIVING_ITEM = 10 
+from .concurrency import VersionConflict, check_if_match, conflict_error, versioned_update, with_etag
+from . import bulk, events, facets, geo, services, stats
+
+# Everything SwapSerializer renders, fetched in the same query as the swaps
+SWAP_RELATIONS = ('user', 'item__uploader', 'requested_item__uploader')
+
+# Most objects a single batch request may ask for
+MAX_BATCH_IDS = 100
+
+def visible_items(user):
+    # Staff users can see any item. Everyone else only sees approved and available items.
+    if user.is_authenticated and user.is_staff:
+        return Item.objects.select_related('uploader')
+    return Item.objects.filter(available=True, moderation_status='approved').select_related('uploader')
+
+def parse_batch_ids(request):
+    """Reads ?ids=1,2,3 into a list of unique ids, keeping the requested order."""
+    raw = [value.strip() for value in request.query_params.get('ids', '').split(',') if value.strip()]
+    if not raw:
+        raise ValidationError({'ids': 'Pass a comma separated list of ids.'})
+    # isdigit() alone also accepts digits like '²', which int() can't parse
+    if not all(value.isascii() and value.isdigit() for value in raw):
+        raise ValidationError({'ids': 'Ids must be whole numbers.'})
+    ids = list(dict.fromkeys(int(value) for value in raw))
+    # Larger ids can't be bound to a query; SQLite raises OverflowError
+    if any(pk > facets.MAX_INT for pk in ids):
+        raise ValidationError({'ids': 'Id out of range.'})
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValidationError({'ids': f'At most {MAX_BATCH_IDS} ids per request.'})
+    return ids
+
+def batch_response(objects, ids, serializer_class, request):
+    # Results come back in the order they were asked for; ids that don't exist
+    # or aren't visible to this user are listed under 'missing'.
+    by_id = {obj.id: obj for obj in objects}
+    found = [by_id[pk] for pk in ids if pk in by_id]
+    serializer = serializer_class(found, many=True, context={'request': request})
+    return Response({
+        'results': serializer.data,
+        'missing': [pk for pk in ids if pk not in by_id],
+    })
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -61,11 +106,18 @@ def logout_user(request):
     print("Logout successful on server side.")
     return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
 
-@api_view(['GET'])
+@api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
     print(f"Profile requested for user: {request.user.email if request.user.is_authenticated else 'Anonymous'}")
-    serializer = UserSerializer(request.user)
+    if request.method == 'PATCH':
+        # Only the coarse location can be changed; everything else is read-only
+        serializer = ProfileSerializer(request.user, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        print(f"Location updated for user: {request.user.email}")
+        return Response(serializer.data)
+    serializer = ProfileSerializer(request.user)
     return Response(serializer.data)
 
 class ItemListCreateView(generics.ListCreateAPIView):
@@ -80,12 +132,15 @@ class ItemListCreateView(generics.ListCreateAPIView):
         print("Fetching items for ItemListCreateView...")
         if self.request.user.is_authenticated and self.request.user.is_staff:
             # Staff users see all items regardless of moderation status
-            queryset = Item.objects.all()
+            queryset = Item.objects.select_related('uploader')
             print(f"Staff user. Number of items found in queryset: {queryset.count()}")
         else:
             # Regular users only see approved and available items
-            queryset = Item.objects.filter(available=True, moderation_status='approved')
+            queryset = Item.objects.filter(available=True, moderation_status='approved').select_related('uploader')
             print(f"Regular user. Number of approved and available items found: {queryset.count()}")
+
+        # Faceted filters (points buckets/range, redeemable, uploader, recency, featured)
+        queryset = facets.filter_items(queryset, self.request.query_params)
         
         for item in queryset:
             print(f"  - Item: {item.title}, Available: {item.available}, Moderation: {item.moderation_status}, Image: {item.image.url if item.image else 'No image'}")
@@ -99,8 +154,11 @@ class ItemListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         print(f"Attempting to create item for user: {self.request.user.email}")
         print(f"Received data for item: {serializer.validated_data}")
-        # New items default to pending moderation status
-        serializer.save(uploader=self.request.user, available=True, moderation_status='pending')
+        # New items default to pending moderation status, and to the uploader's location if none was given
+        location = {}
+        if serializer.validated_data.get('latitude') is None:
+            location = {'latitude': self.request.user.latitude, 'longitude': self.request.user.longitude}
+        serializer.save(uploader=self.request.user, available=True, moderation_status='pending', **location)
         print(f"Item created successfully: {serializer.instance.title} (ID: {serializer.instance.id}), Moderation: {serializer.instance.moderation_status}")
         print(f"Item available status: {serializer.instance.available}")
         print(f"Item image path: {serializer.instance.image.url if serializer.instance.image else 'No image'}")
@@ -112,9 +170,17 @@ class ItemDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         # For detail view, if user is staff, they can see any item.
         # Otherwise, only approved and available items.
-        if self.request.user.is_authenticated and self.request.user.is_staff:
-            return Item.objects.all()
-        return Item.objects.filter(available=True, moderation_status='approved')
+        return visible_items(self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        # The ETag carries the version; send it back as If-Match when updating
+        return with_etag(Response(serializer.data), instance)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        return with_etag(response, self._updated_instance)
 
     def perform_update(self, serializer):
         # Ensure the uploader field is not changed
@@ -123,23 +189,89 @@ class ItemDetailView(generics.RetrieveUpdateDestroyAPIView):
         # Ensure moderation_status is not changed by non-staff users
         if not self.request.user.is_staff and 'moderation_status' in serializer.validated_data:
             serializer.validated_data.pop('moderation_status')
-        serializer.save()
+
+        # Write only the submitted fields, and only if nobody changed the item since it was read
+        instance = serializer.instance
+        expected_version = check_if_match(self.request, instance)
+        for field, value in serializer.validated_data.items():
+            setattr(instance, field, value)
+        update_fields = list(serializer.validated_data)
+        if 'latitude' in update_fields or 'longitude' in update_fields:
+            instance.sync_geohash()
+            update_fields.append('geohash')
+        if update_fields:
+            try:
+                versioned_update(instance, update_fields, expected_version)
+            except VersionConflict:
+                raise conflict_error(self.request)
+        self._updated_instance = instance
 
     def perform_destroy(self, instance):
         # Optionally, handle related swaps or points before deleting
         # For now, Django's CASCADE on ForeignKey will handle related swaps
-        instance.delete()
+        expected_version = check_if_match(self.request, instance)
+        deleted, _ = Item.objects.filter(pk=instance.pk, version=expected_version).delete()
+        if not deleted:
+            raise conflict_error(self.request)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def items_batch(request):
+    """
+    Returns many items in one response (?ids=1,2,3), with the same visibility
+    rules as the item detail view and a single query.
+    """
+    ids = parse_batch_ids(request)
+    return batch_response(visible_items(request.user).filter(pk__in=ids), ids, ItemSerializer, request)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def items_nearby(request):
+    """
+    Returns the visible items within ?radius= km (default 25) of ?lat=&lng=,
+    nearest first, each with its distance_km. Takes ?limit= and the same
+    facet filters as the item list.
+    """
+    lat, lng, radius, limit = geo.parse_nearby_params(request.query_params)
+    queryset = facets.filter_items(visible_items(request.user), request.query_params)
+    found = geo.nearby(queryset, lat, lng, radius, limit)
+    serializer = ItemSerializer([item for item, _ in found], many=True, context={'request': request})
+    results = serializer.data
+    for data, (_, distance) in zip(results, found):
+        data['distance_km'] = round(distance, 2)
+    print(f"Nearby items for ({lat}, {lng}) within {radius} km: {len(found)} found.")
+    return Response({'count': len(results), 'results': results})
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def community_stats(request):
+    """
+    Returns platform-wide stats (points in circulation, swaps and rehomed items
+    per day, this week and all time) and the points leaderboard. They are read
+    from summary tables kept up to date by core.stats and cached briefly.
+    """
+    return Response(stats.cached_community_stats())
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def item_facets(request):
+    """
+    Returns the filter sidebar counts for the public catalog, read from the
+    precomputed ItemFacetCount table rather than aggregated per request.
+    """
+    return Response(facets.facet_counts())
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def featured_items(request):
-    items = Item.objects.filter(featured=True, available=True, moderation_status='approved')[:10] # Filter by approved
-    serializer = ItemSerializer(items, many=True)
+    items = Item.objects.filter(featured=True, available=True, moderation_status='approved').select_related('uploader')[:10] # Filter by approved
+    serializer = ItemSerializer(items, many=True, context={'request': request})
     print(f"Number of featured items found: {len(items)}")
     return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def create_swap(request):
     item_id = request.data.get('item_id')
     requested_item_id = request.data.get('requested_item_id') # New field for item-for-item swap
@@ -172,11 +304,6 @@ def create_swap(request):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Set the offered item to unavailable immediately to prevent double-swapping
-            requested_item.available = False
-            requested_item.save()
-            print(f"Offered item '{requested_item.title}' set to unavailable.")
-
             swap, created = Swap.objects.get_or_create(
                 user=request.user,
                 item=item,
@@ -189,7 +316,19 @@ def create_swap(request):
                     {'error': 'You have already requested this item with the same offer.'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            # Set the offered item to unavailable immediately to prevent double-swapping.
+            # The write only succeeds if the item is still available at the version we read,
+            # so two concurrent offers of the same item can't both get through.
+            requested_item.available = False
+            try:
+                versioned_update(requested_item, ['available'], available=True)
+            except VersionConflict:
+                raise conflict_error(request)
+            print(f"Offered item '{requested_item.title}' set to unavailable.")
             print(f"Item-for-item swap request created: {swap.user.email} offers {swap.requested_item.title} for {swap.item.title}")
+            events.record(events.swap_event(events.SWAP_REQUESTED, swap, actor=request.user))
+            stats.swap_requested(swap)
 
         else:
             # This is a point redemption
@@ -218,10 +357,24 @@ def create_swap(request):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            request.user.points -= item.point_value # Deduct item's point_value
-            request.user.save()
-            print(f"User {request.user.email} points deducted by {item.point_value}. New balance: {request.user.points}")
+            # Deduct item's point_value, re-checking the balance in the same UPDATE
+            deducted = User.objects.filter(pk=request.user.pk, points__gte=item.point_value).update(
+                points=F('points') - item.point_value
+            )
+            if not deducted:
+                transaction.set_rollback(True)
+                return Response(
+                    {'error': f'Insufficient points. You need {item.point_value} points to redeem this item.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            print(f"User {request.user.email} points deducted by {item.point_value}.")
             print(f"Point redemption request created: {swap.user.email} redeems {swap.item.title}")
+            events.record(
+                events.swap_event(events.SWAP_REQUESTED, swap, actor=request.user),
+                events.points_event(request.user.pk, -item.point_value, 'redemption', swap.id, actor=request.user),
+            )
+            stats.swap_requested(swap)
+            stats.points_changed({request.user.pk: -item.point_value})
 
         serializer = SwapSerializer(swap)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -236,24 +389,91 @@ def create_swap(request):
 @permission_classes([IsAuthenticated])
 def user_swaps(request):
     # This view lists swaps INITIATED BY the current user (both point redemptions and item-for-item swaps)
-    swaps = Swap.objects.filter(user=request.user)
-    serializer = SwapSerializer(swaps, many=True)
+    swaps = Swap.objects.filter(user=request.user).select_related(*SWAP_RELATIONS)
+    serializer = SwapSerializer(swaps, many=True, context={'request': request})
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def swap_history(request):
+    """
+    Pages through the current user's archived swaps, newest first.
+    ?role=requester for swaps they made, ?role=owner for swaps made for their
+    items; both by default. Recent and pending swaps stay in /swaps/.
+    """
+    role = request.query_params.get('role')
+    if role == 'requester':
+        history = SwapArchive.objects.filter(user=request.user)
+    elif role == 'owner':
+        history = SwapArchive.objects.filter(item_uploader=request.user)
+    elif role is None:
+        history = SwapArchive.objects.filter(Q(user=request.user) | Q(item_uploader=request.user))
+    else:
+        return Response({'error': 'role must be requester or owner.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = HistoryPagination()
+    page = paginator.paginate_queryset(history, request)
+    return paginator.get_paginated_response(SwapArchiveSerializer(page, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def activity_feed(request):
+    """
+    Pages through what happened to the current user, newest first: their swap
+    requests, requests for their items, moderation of their items and points
+    changes. Read from the ActivityEntry projection of the event log.
+    """
+    paginator = HistoryPagination()
+    page = paginator.paginate_queryset(ActivityEntry.objects.filter(user_id=request.user.pk), request)
+    return paginator.get_paginated_response(ActivityEntrySerializer(page, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def item_history(request, pk):
+    """
+    Pages through the swap and moderation events of an item, newest first.
+    Only the item's uploader and staff users can see it. The history outlives
+    the swaps themselves, including archived ones.
+    """
+    try:
+        item = Item.objects.get(pk=pk)
+    except Item.DoesNotExist:
+        return Response({'error': 'Item not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if request.user != item.uploader and not request.user.is_staff:
+        return Response({'error': 'You are not authorized to view this item\'s history.'}, status=status.HTTP_403_FORBIDDEN)
+
+    paginator = HistoryPagination()
+    page = paginator.paginate_queryset(ItemHistoryEntry.objects.filter(item_id=item.pk), request)
+    return paginator.get_paginated_response(ItemHistoryEntrySerializer(page, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def swaps_batch(request):
+    """
+    Returns many swaps in one response (?ids=1,2,3). Users see the swaps they
+    made or that were made for their items; staff users see any swap.
+    """
+    ids = parse_batch_ids(request)
+    swaps = Swap.objects.filter(pk__in=ids).select_related(*SWAP_RELATIONS)
+    if not request.user.is_staff:
+        swaps = swaps.filter(Q(user=request.user) | Q(item__uploader=request.user))
+    return batch_response(swaps, ids, SwapSerializer, request)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_item_swaps(request):
     # This view lists swaps REQUESTED FOR items UPLOADED BY the current user
-    swaps = Swap.objects.filter(item__uploader=request.user).order_by('-created_at')
-    serializer = SwapSerializer(swaps, many=True)
+    swaps = Swap.objects.filter(item__uploader=request.user).select_related(*SWAP_RELATIONS).order_by('-created_at')
+    serializer = SwapSerializer(swaps, many=True, context={'request': request})
     print(f"My item swaps requested for user {request.user.email}. Found {swaps.count()} swaps.")
     return Response(serializer.data)
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def approve_swap(request, pk):
     try:
-        swap = Swap.objects.get(pk=pk)
+        swap = Swap.objects.select_related('item__uploader', 'requested_item').get(pk=pk)
     except Swap.DoesNotExist:
         return Response({'error': 'Swap request not found.'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -263,50 +483,23 @@ def approve_swap(request, pk):
     if swap.status != 'pending':
         return Response({'error': f'Swap is already {swap.status}.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    uploader_user = swap.item.uploader # The owner of the item being requested
-    item_to_give = swap.item # The item being requested
-
-    if swap.requested_item:
-        # This is an item-for-item swap
-        offered_item = swap.requested_item
-        
-        # Ensure both items are set to unavailable
-        item_to_give.available = False
-        item_to_give.save()
-        offered_item.available = False
-        offered_item.save()
-        
-        # Uploader gets POINTS_FOR_GIVING_ITEM for successfully swapping their item
-        uploader_user.points += POINTS_FOR_GIVING_ITEM
-        uploader_user.save()
-        print(f"Uploader {uploader_user.email} points increased by {POINTS_FOR_GIVING_ITEM} for swap. New balance: {uploader_user.points}")
-        print(f"Item-for-item swap {swap.id} approved. '{item_to_give.title}' and '{offered_item.title}' are now unavailable.")
-        
-    else:
-        # This is a point redemption
-        # Uploader gets the item's point_value for giving it away via points
-        if item_to_give.point_value is not None:
-            uploader_user.points += item_to_give.point_value
-            uploader_user.save()
-            print(f"Uploader {uploader_user.email} points increased by {item_to_give.point_value} for redemption. New balance: {uploader_user.points}")
-        else:
-            print(f"Warning: Item {item_to_give.title} redeemed via points but has no point_value set for uploader to gain.")
-        
-        item_to_give.available = False
-        item_to_give.save()
-        print(f"Point redemption {swap.id} approved. Item '{item_to_give.title}' is now unavailable.")
-
-    swap.status = 'approved'
-    swap.save()
+    expected_version = check_if_match(request, swap)
+    # Every write is conditional on the version read above. If any of them loses a
+    # race the whole transaction is rolled back and the client is asked to retry.
+    try:
+        services.approve_swap(swap, actor=request.user, expected_version=expected_version)
+    except VersionConflict:
+        raise conflict_error(request)
     
     serializer = SwapSerializer(swap)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return with_etag(Response(serializer.data, status=status.HTTP_200_OK), swap)
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def disapprove_swap(request, pk):
     try:
-        swap = Swap.objects.get(pk=pk)
+        swap = Swap.objects.select_related('item__uploader', 'requested_item', 'user').get(pk=pk)
     except Swap.DoesNotExist:
         return Response({'error': 'Swap request not found.'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -316,26 +509,14 @@ def disapprove_swap(request, pk):
     if swap.status != 'pending':
         return Response({'error': f'Swap is already {swap.status}. Only pending swaps can be disapproved.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # If an item was offered in the swap, make it available again
-    if swap.requested_item:
-        offered_item = swap.requested_item
-        offered_item.available = True
-        offered_item.save()
-        print(f"Offered item '{offered_item.title}' made available again after swap disapproval.")
-    
-    # If it was a point redemption, refund points to the requester
-    if not swap.requested_item: # This was a point redemption
-        requester = swap.user
-        if swap.item.point_value is not None:
-            requester.points += swap.item.point_value # Refund points to requester
-            requester.save()
-            print(f"Requester {requester.email} refunded {swap.item.point_value} points for disapproved redemption.")
-
-    swap.status = 'rejected'
-    swap.save()
+    expected_version = check_if_match(request, swap)
+    try:
+        services.reject_swap(swap, actor=request.user, expected_version=expected_version)
+    except VersionConflict:
+        raise conflict_error(request)
     
     serializer = SwapSerializer(swap)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return with_etag(Response(serializer.data, status=status.HTTP_200_OK), swap)
 
 # --- Moderator-specific views ---
 
@@ -346,15 +527,17 @@ def moderator_items_list(request):
     Lists all items for moderation, regardless of availability or moderation status.
     Only accessible by staff users.
     """
-    items = Item.objects.all().order_by('-created_at')
-    serializer = ItemSerializer(items, many=True)
+    items = Item.objects.select_related('uploader').order_by('-created_at')
+    serializer = ItemSerializer(items, many=True, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['PATCH'])
 @permission_classes([IsStaffUser])
+@transaction.atomic
 def approve_item(request, pk):
     """
     Approves an item, setting its moderation_status to 'approved'.
+    Honours If-Match, so two moderators can't silently overwrite each other.
     Only accessible by staff users.
     """
     try:
@@ -362,17 +545,21 @@ def approve_item(request, pk):
     except Item.DoesNotExist:
         return Response({'error': 'Item not found.'}, status=status.HTTP_404_NOT_FOUND)
     
-    item.moderation_status = 'approved'
-    item.save()
+    expected_version = check_if_match(request, item)
+    try:
+        services.moderate_item(item, 'approved', actor=request.user, expected_version=expected_version)
+    except VersionConflict:
+        raise conflict_error(request)
     serializer = ItemSerializer(item)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return with_etag(Response(serializer.data, status=status.HTTP_200_OK), item)
 
 @api_view(['PATCH'])
 @permission_classes([IsStaffUser])
+@transaction.atomic
 def reject_item(request, pk):
     """
     Rejects an item, setting its moderation_status to 'rejected'.
-    Also makes the item unavailable.
+    Also makes the item unavailable. Honours If-Match like approve_item.
     Only accessible by staff users.
     """
     try:
@@ -380,11 +567,13 @@ def reject_item(request, pk):
     except Item.DoesNotExist:
         return Response({'error': 'Item not found.'}, status=status.HTTP_404_NOT_FOUND)
     
-    item.moderation_status = 'rejected'
-    item.available = False # Rejected items should not be available
-    item.save()
+    expected_version = check_if_match(request, item)
+    try:
+        services.moderate_item(item, 'rejected', actor=request.user, expected_version=expected_version)
+    except VersionConflict:
+        raise conflict_error(request)
     serializer = ItemSerializer(item)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return with_etag(Response(serializer.data, status=status.HTTP_200_OK), item)
 
 @api_view(['DELETE'])
 @permission_classes([IsStaffUser])
@@ -398,5 +587,53 @@ def delete_item_moderator(request, pk):
     except Item.DoesNotExist:
         return Response({'error': 'Item not found.'}, status=status.HTTP_404_NOT_FOUND)
     
-    item.delete()
+    expected_version = check_if_match(request, item)
+    deleted, _ = Item.objects.filter(pk=item.pk, version=expected_version).delete()
+    if not deleted:
+        raise conflict_error(request)
     return Response({'message': 'Item deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+@permission_classes([IsStaffUser])
+def import_items(request):
+    """
+    Bulk-imports items from an uploaded NDJSON or CSV file (`file`).
+    Rows without an uploader_email are assigned to the requesting moderator.
+    Pass `start` to resume after the `last_row` of an earlier, interrupted import.
+    Only accessible by staff users.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = request.data.get('fmt') or bulk.guess_format(upload.name)
+    if fmt not in bulk.FORMATS:
+        return Response({'error': f'Unsupported format {fmt}.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start = int(request.data.get('start', 0))
+    except ValueError:
+        return Response({'error': 'start must be a row number.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+    # Image refs must name files already in media storage; URLs are never fetched from here
+    image_resolver = bulk.ImageResolver(check_storage=True)
+    report = bulk.import_items(bulk.read_rows(stream, fmt), default_uploader=request.user,
+                               image_resolver=image_resolver, start=start)
+    # An unreadable file still returns what was imported, so the caller can resume from last_row
+    return Response(report, status=status.HTTP_400_BAD_REQUEST if 'error' in report else status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsStaffUser])
+def export_items(request):
+    """
+    Streams every item as NDJSON (default) or CSV (`?fmt=csv`).
+    Only accessible by staff users.
+    """
+    fmt = request.query_params.get('fmt', 'ndjson')
+    if fmt not in bulk.FORMATS:
+        return Response({'error': f'Unsupported format {fmt}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(bulk.export_lines(Item.objects.all(), fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="items.{fmt}"'
+    return response
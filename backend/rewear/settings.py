@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-your-secret-key-here-change-in-production'
@@ -19,12 +21,14 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'core',
-    'cloudinary_storage',
-    'cloudinary',
+    # cloudinary/cloudinary_storage are not installed as apps: only the media storage
+    # backend needs them, and default_storage imports it on first use.
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.ConcurrencyLimitMiddleware', # Sheds load before any other work is done
+    'core.middleware.CompressionMiddleware', # Before anything that reads or changes the response body
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,7 +91,7 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
-# MEDIA_ROOT = BASE_DIR / 'media' # This line is commented out as media is now on Cloudinary
+MEDIA_ROOT = BASE_DIR / 'media' # Only used by the 'local' media storage profile
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -99,8 +103,53 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer', # Uses orjson when it's installed
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.RouteThrottle', # Uses THROTTLE_RATES below
+    ],
+    # Reverse proxies in front of the app. Client IPs for the throttles and admission control
+    # come from REMOTE_ADDR when 0, else from X-Forwarded-For as added by the outermost proxy.
+    # Never leave it unset: DRF then trusts the whole header, which clients can forge.
+    'NUM_PROXIES': int(os.environ.get('REWEAR_NUM_PROXIES', 0)),
 }
 
+# Token-bucket throttles per route name in core/urls.py (core.throttling), for signed in users
+# and per IP for anonymous clients. 'route:METHOD' entries override 'route' for one method, and
+# routes without an entry use 'default'. '20/min' allows bursts of 20, refilling over a minute.
+THROTTLE_RATES = {
+    'default': {'user': '300/min', 'anon': '120/min'},
+    'login': {'user': '10/min', 'anon': '10/min'},
+    'signup': {'anon': '5/min'},
+    'items': {'user': '60/min', 'anon': '30/min'}, # unpaginated list
+    'items:POST': {'user': '20/min'},
+    'items_nearby': {'user': '60/min', 'anon': '30/min'},
+    'create_swap': {'user': '20/min'},
+    'my_item_swaps': {'user': '60/min'},
+    'moderator_items_list': {'user': '30/min'},
+    'import_items': {'user': '5/min'},
+    'export_items': {'user': '5/min'},
+}
+THROTTLE_STORE = 'memory' # 'cache' shares buckets between processes through CACHES['default']
+
+# Admission control (core.middleware.ConcurrencyLimitMiddleware), per process
+ADMISSION_CONTROL_PATHS = ['/api/']
+ADMISSION_MAX_CONCURRENT = 32 # keep at or below the database connections a process may use
+ADMISSION_MAX_PER_CLIENT = 8 # concurrent requests from one IP before it gets a 429
+ADMISSION_QUEUE_TIMEOUT = 2.0 # seconds to wait for a free slot before answering 503
+ADMISSION_RETRY_AFTER = 1 # seconds, sent as Retry-After with the 429/503
+
+# Off: the event log projections (core.projections) are kept up to date by a
+# `run_projections --follow` worker, so requests never wait on the projection lock.
+# Turn on to catch them up after every write instead, e.g. in development.
+PROJECTIONS_RUN_ON_COMMIT = False
+
+# Response compression (core.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024 # bytes; smaller responses are sent uncompressed
+COMPRESSION_BROTLI_QUALITY = 5 # 0-11; higher is smaller but slower
+
 # CORS settings
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [
@@ -130,5 +179,30 @@ CLOUDINARY_STORAGE = {
     'DEFAULT_QUALITY': 'auto',   # Optimize images: auto compression
 }
 
-# Set Django's default file storage to Cloudinary
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# Media storage profiles. REWEAR_MEDIA_STORAGE picks one; without it, Cloudinary is used
+# when credentials are configured and local files otherwise. The chosen profile becomes
+# STORAGES['default'], whose backend Django only imports when media is first used.
+MEDIA_STORAGE_PROFILES = {
+    'local': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'cloudinary': {
+        'BACKEND': 'cloudinary_storage.storage.MediaCloudinaryStorage',
+    },
+}
+MEDIA_STORAGE_PROFILE = os.environ.get(
+    'REWEAR_MEDIA_STORAGE',
+    'cloudinary' if os.environ.get('CLOUDINARY_CLOUD_NAME') else 'local',
+)
+
+if MEDIA_STORAGE_PROFILE not in MEDIA_STORAGE_PROFILES:
+    raise ImproperlyConfigured(
+        f"REWEAR_MEDIA_STORAGE must be one of {', '.join(MEDIA_STORAGE_PROFILES)}, not {MEDIA_STORAGE_PROFILE!r}."
+    )
+
+STORAGES = {
+    'default': MEDIA_STORAGE_PROFILES[MEDIA_STORAGE_PROFILE],
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}